@@ -1,15 +1,31 @@
+import hashlib
+import json
+import logging
 import os
 import time
+from functools import partial
 import streamlit as st
+import utils.dotenv_loader  # Loads .env before any module reads its settings
 from services.job_detail_service import extract_job_details_from_text
 from services.resume_detail_service import extract_resume_details_from_text
 from services.comparison_service import compare_resume_and_job_description
-from services.email_service import generate_job_application_email_dynamic
-from services.referral_service import generate_job_referral_dynamic
-from services.connection_note_service import generate_connection_note_dynamic
+from services.email_service import generate_job_application_email_dynamic, stream_job_application_email_dynamic
+from services.referral_service import generate_job_referral_dynamic, stream_job_referral_dynamic
+from services.connection_note_service import generate_connection_note_dynamic, stream_connection_note_dynamic
+from services.combined_generation_service import generate_application_content_combined
+from utils.instrumentation import start_run
 from utils.json_template_loader import load_templates
+from utils.llm_scheduler import scheduling
+from utils.stream_multiplexer import multiplex_streams
+from utils.task_graph import run_task_graph
 from streamlit_local_storage import LocalStorage
 
+# LLM call records are logged as JSON lines on the arbeit.llm logger at INFO level
+logging.basicConfig(level=os.getenv("LOG_LEVEL", "WARNING").upper())
+
+# Time budget for a Process click, including waiting for rate limits and retries
+PROCESS_DEADLINE_SECONDS = float(os.getenv("PROCESS_DEADLINE_SECONDS", "120"))
+
 # Function to load templates
 def load_letter_templates():
     try:
@@ -33,44 +49,210 @@ def load_other_templates():
 # Function to process job posting and resume
 def process_input(job_posting_text, resume_text):
     if not job_posting_text or not resume_text:
-        return None, None
+        return None, None, None
+
+    # Both extractions are independent, the comparison needs both of them
+    results = run_task_graph({
+        "job_details": (partial(extract_job_details_from_text, job_posting_text), []),
+        "resume_details": (partial(extract_resume_details_from_text, resume_text), []),
+        "comparison_results": (compare_extracted_details, ["job_details", "resume_details"]),
+    })
 
-    job_details = extract_job_details_from_text(job_posting_text)
-    resume_details = extract_resume_details_from_text(resume_text)
-    comparison_results = compare_resume_and_job_description(resume_details, job_details)
+    return results["job_details"], results["resume_details"], results["comparison_results"]
 
-    return job_details, resume_details, comparison_results
+def compare_extracted_details(job_details, resume_details):
+    return compare_resume_and_job_description(resume_details, job_details)
 
-def generate_application_content(selected_application_types, custom_templates, cover_letter_template_names, cover_letter_templates, job_details, resume_details, referral_template, connection_note_template):
-    job_application_email = ""
-    referral_message = ""
-    connection_note = ""
+# Generated artifact name -> (blocking generator, streaming generator, result title)
+ARTIFACT_GENERATORS = {
+    "job_application_email": (generate_job_application_email_dynamic, stream_job_application_email_dynamic, "📧 Generated Job Application Email"),
+    "referral_message": (generate_job_referral_dynamic, stream_job_referral_dynamic, "👥 Generated Referral Message"),
+    "connection_note": (generate_connection_note_dynamic, stream_connection_note_dynamic, "✍🏻 Generated LinkedIn Connection Note"),
+}
+
+# Pick the template used for each selected application type
+def select_generation_templates(selected_application_types, custom_templates, cover_letter_template_names, cover_letter_templates, referral_template, connection_note_template, selected_cover_letter_template=None):
+    templates = {}
 
     # Handle Cover Letter Generation
     if "Cover Letter" in selected_application_types:
-        selected_cover_letter_template = "Custom Cover Letter" if custom_templates.get("cover_letter") else cover_letter_template_names[0]
-        selected_template = custom_templates.get("cover_letter") or next(template for template in cover_letter_templates if template["name"] == selected_cover_letter_template)["template"]
-        job_application_email += generate_job_application_email_dynamic(selected_template, resume_details, job_details) + "\n\n"
+        if not selected_cover_letter_template:
+            selected_cover_letter_template = "Custom Cover Letter" if custom_templates.get("cover_letter") else cover_letter_template_names[0]
+        if selected_cover_letter_template == "Custom Cover Letter":
+            templates["job_application_email"] = custom_templates["cover_letter"]
+        else:
+            templates["job_application_email"] = next(template for template in cover_letter_templates if template["name"] == selected_cover_letter_template)["template"]
 
     # Handle Referral Message Generation
     if "Referral Message" in selected_application_types:
-        if custom_templates.get("referral"):
-            # If a custom referral message is provided, use it along with the predefined template for structure
-            referral_message = generate_job_referral_dynamic(custom_templates.get("referral"), resume_details, job_details)
-        else:
-            # Otherwise, use the default referral template
-            referral_message = generate_job_referral_dynamic(referral_template, resume_details, job_details)
+        # If a custom referral message is provided, use it, otherwise use the default referral template
+        templates["referral_message"] = custom_templates.get("referral") or referral_template
 
     # Handle LinkedIn Connection Request Note Generation
     if "LinkedIn Connection Request Note" in selected_application_types:
-        if custom_templates.get("connection_note"):
-            # If a custom connection note is provided, use it along with the predefined template for structure
-            connection_note = generate_connection_note_dynamic(custom_templates.get("connection_note"), resume_details, job_details)
+        # If a custom connection note is provided, use it, otherwise use the default connection note template
+        templates["connection_note"] = custom_templates.get("connection_note") or connection_note_template
+
+    return templates
+
+def generate_artifact(name, template, job_details, resume_details):
+    generate = ARTIFACT_GENERATORS[name][0]
+    content = generate(template, resume_details, job_details)
+    return content + "\n\n" if name == "job_application_email" else content
+
+# Build one generation task per selected application type, each taking the extracted job and resume details
+def build_generation_tasks(selected_application_types, custom_templates, cover_letter_template_names, cover_letter_templates, referral_template, connection_note_template):
+    templates = select_generation_templates(
+        selected_application_types, custom_templates, cover_letter_template_names, cover_letter_templates,
+        referral_template, connection_note_template
+    )
+    return {name: partial(generate_artifact, name, template) for name, template in templates.items()}
+
+# One result pane per artifact, side by side
+def create_artifact_panes(names):
+    panes = {}
+    if not names:
+        return panes
+
+    for column, name in zip(st.columns(len(names)), names):
+        with column:
+            st.subheader(ARTIFACT_GENERATORS[name][2])
+            panes[name] = st.empty()
+    return panes
+
+def render_generated_content(panes, contents):
+    for name, content in contents.items():
+        if content and name in panes:
+            # Show generated content in code blocks for copy functionality
+            panes[name].code(content.strip(), language='text')
+
+# Stream each artifact into its pane as its tokens arrive, returning the artifacts that finished without error
+def render_generation_streams(streams, panes):
+    contents = {name: "" for name in streams}
+    for name, chunk in multiplex_streams(streams):
+        if isinstance(chunk, Exception):
+            panes[name].error(f"Error generating content: {chunk}")
+            contents.pop(name, None)
+            continue
+        if name in contents:
+            contents[name] += chunk
+            panes[name].code(contents[name] + "▌", language='text')
+
+    render_generated_content(panes, contents)
+    return contents
+
+# Results are kept in session state across reruns, each one stored with a fingerprint of the inputs that produced it
+def fingerprint(*inputs):
+    return hashlib.sha256(json.dumps(inputs, sort_keys=True, ensure_ascii=False).encode("utf-8")).hexdigest()
+
+def get_session_result(key, inputs_fingerprint):
+    entry = st.session_state.setdefault("results", {}).get(key)
+    if entry and entry["fingerprint"] == inputs_fingerprint:
+        return entry["value"]
+    return None
+
+def set_session_result(key, inputs_fingerprint, value):
+    st.session_state.setdefault("results", {})[key] = {"fingerprint": inputs_fingerprint, "value": value}
+
+# Show every selected artifact, generating only those whose template or extracted details changed since they were last generated
+def render_application_content(templates, job_details, resume_details, combined_generation):
+    details_fingerprint = fingerprint(job_details, resume_details)
+    panes = create_artifact_panes(list(templates))
+
+    contents, pending = {}, {}
+    for name, template in templates.items():
+        artifact_fingerprint = fingerprint(template, details_fingerprint)
+        content = get_session_result(name, artifact_fingerprint)
+        if content is None:
+            pending[name] = (template, artifact_fingerprint)
         else:
-            # Otherwise, use the default connection note template
-            connection_note = generate_connection_note_dynamic(connection_note_template, resume_details, job_details)
+            contents[name] = content
+    render_generated_content(panes, contents)
 
-    return job_application_email, referral_message, connection_note
+    if not pending:
+        return
+
+    if combined_generation and len(pending) > 1:
+        with st.spinner("Generating... Please wait ⏳"):
+            generated = generate_application_content_combined(
+                {name: template for name, (template, _) in pending.items()}, resume_details, job_details
+            )
+        render_generated_content(panes, generated)
+    else:
+        # Stream the generated application content as it is produced
+        generated = render_generation_streams({
+            name: ARTIFACT_GENERATORS[name][1](template, resume_details, job_details)
+            for name, (template, _) in pending.items()
+        }, panes)
+
+    for name, content in generated.items():
+        if content:
+            set_session_result(name, pending[name][1], content)
+
+# Waterfall of the model calls and cache lookups made during this rerun
+def render_debug_panel(run):
+    with st.expander("⏱️ Run Timing", expanded=True):
+        timeline = run.timeline()
+        if not timeline:
+            st.caption("No model calls or cache lookups in this run.")
+            return
+
+        llm_calls = [record for record in timeline if record["kind"] == "llm"]
+        prompt_tokens = sum(record["prompt_tokens"] or 0 for record in llm_calls)
+        completion_tokens = sum(record["completion_tokens"] or 0 for record in llm_calls)
+        st.caption(f"Run {run.run_id}: {len(llm_calls)} model calls, {prompt_tokens} prompt tokens, {completion_tokens} completion tokens")
+
+        rows = [
+            {
+                "call": f"{index + 1}. {record['stage']}",
+                "kind": f"cache {'hit' if record['cache_hit'] else 'miss'}" if record["kind"] == "cache" else record["kind"],
+                "start": record["start"],
+                "end": record["end"],
+                "wall_time": record["wall_time"],
+                "queue_time": record["queue_time"],
+                "scheduler_wait": record["scheduler_wait"],
+                "prompt_tokens": record["prompt_tokens"],
+                "completion_tokens": record["completion_tokens"],
+                "parse_success": record["parse_success"],
+                "error": record["error"],
+            }
+            for index, record in enumerate(timeline)
+        ]
+        st.vega_lite_chart(rows, {
+            "mark": "bar",
+            "encoding": {
+                "y": {"field": "call", "type": "nominal", "sort": None, "title": None},
+                "x": {"field": "start", "type": "quantitative", "title": "seconds since the start of the run"},
+                "x2": {"field": "end"},
+                "color": {"field": "kind", "type": "nominal"},
+                "tooltip": [{"field": field} for field in ("call", "wall_time", "queue_time", "scheduler_wait", "prompt_tokens", "completion_tokens", "parse_success", "error")],
+            },
+        }, use_container_width=True)
+        st.dataframe(rows, use_container_width=True)
+
+def generate_application_content(selected_application_types, custom_templates, cover_letter_template_names, cover_letter_templates, job_details, resume_details, referral_template, connection_note_template, combined=False):
+    if combined:
+        # One request for all selected artifacts, split back into the individual outputs
+        templates = select_generation_templates(
+            selected_application_types, custom_templates, cover_letter_template_names, cover_letter_templates,
+            referral_template, connection_note_template
+        )
+        results = generate_application_content_combined(templates, resume_details, job_details)
+        if "job_application_email" in results:
+            results["job_application_email"] += "\n\n"
+    else:
+        generation_tasks = build_generation_tasks(
+            selected_application_types, custom_templates, cover_letter_template_names, cover_letter_templates,
+            referral_template, connection_note_template
+        )
+
+        # The generators only depend on the extracted details, so they all run concurrently
+        results = run_task_graph({
+            name: (partial(generate, job_details=job_details, resume_details=resume_details), [])
+            for name, generate in generation_tasks.items()
+        })
+
+    return results.get("job_application_email", ""), results.get("referral_message", ""), results.get("connection_note", "")
 
 # Main function
 def main():
@@ -108,7 +290,16 @@ def main():
             options=["Cover Letter", "Referral Message", "LinkedIn Connection Request Note"]
         )
 
+        # Several artifacts can share one request instead of being streamed one request each
+        combined_generation = False
+        if len(selected_application_types) > 1:
+            combined_generation = st.checkbox(
+                "Generate all messages in a single request",
+                help="Sends the resume and job details once for all selected messages. Results appear when all of them are done."
+            )
+
         # Cover letter template selection
+        selected_cover_letter_template = None
         if "Cover Letter" in selected_application_types:
             available_templates = []
             if custom_templates.get("cover_letter"):
@@ -138,6 +329,9 @@ def main():
 
         process_button = st.button("✨ Process")
 
+    show_debug_panel = st.sidebar.checkbox("Show timing debug panel", value=False)
+    run = start_run()
+
     # Results section
     with results_col:
         placeholder = st.empty()
@@ -167,44 +361,47 @@ def main():
         if not job_posting_text or not resume_text:
             placeholder.markdown('<div class="centered">📝 Please input job description and resume details to process.</div>', unsafe_allow_html=True)
         else:
-            if process_button:
-                with st.spinner("Processing... Please wait ⏳"):
+            extraction_fingerprint = fingerprint(job_posting_text, resume_text)
+            extraction = get_session_result("extraction", extraction_fingerprint)
+
+            # Extraction and comparison only run again when the job description or resume changed
+            if process_button and extraction is None:
+                with st.spinner("Processing... Please wait ⏳"), scheduling(timeout=PROCESS_DEADLINE_SECONDS):
                     job_details, resume_details, comparison_results = process_input(job_posting_text, resume_text)
 
-                    if job_details and resume_details:
-                        # Generate application content
-                        job_application_email, referral_message, connection_note = generate_application_content(
-                            selected_application_types, custom_templates, cover_letter_template_names, cover_letter_templates,
-                            job_details, resume_details, referral_template, connection_note_template
-                        )
-
-                        # Display results
-                        st.subheader("⚖️ Comparison Results")
-                        matching_score = comparison_results.get('matching_score', 0)
-                        missing_skills = comparison_results.get('missing_skills', [])
-                        missing_keywords = comparison_results.get('missing_keywords', [])
-                        st.text(f"✅ Matching Score: {matching_score}/100\n\n❌ Missing Skills: {', '.join(missing_skills) if missing_skills else 'None'}\n\n❌ Missing Keywords: {', '.join(missing_keywords) if missing_keywords else 'None'}\n")
-
-                        # Show generated content in code blocks for copy functionality
-                        if job_application_email:
-                            st.subheader("📧 Generated Job Application Email")
-                            st.code(job_application_email, language='text')
-
-                        if referral_message:
-                            st.subheader("👥 Generated Referral Message")
-                            st.code(referral_message, language='text')
-
-                        if connection_note:
-                            st.subheader("✍🏻 Generated LinkedIn Connection Note")
-                            st.code(connection_note, language='text')
-
-                        # Store inputs in cookies after processing
-                        controller.setItem("job_posting_text", job_posting_text, key="job_posting_text")
-                        controller.setItem("resume_text", resume_text, key="resume_text")
-                    else:
-                        placeholder.markdown('<div class="centered">📝 Error in processing the inputs, please check the text format.</div>', unsafe_allow_html=True)
+                if job_details and resume_details:
+                    extraction = (job_details, resume_details, comparison_results)
+                    if "error" not in job_details and "error" not in resume_details:
+                        set_session_result("extraction", extraction_fingerprint, extraction)
+
+                    # Store inputs in cookies after processing
+                    controller.setItem("job_posting_text", job_posting_text, key="job_posting_text")
+                    controller.setItem("resume_text", resume_text, key="resume_text")
+
+            if extraction:
+                job_details, resume_details, comparison_results = extraction
+
+                # Display results
+                st.subheader("⚖️ Comparison Results")
+                matching_score = comparison_results.get('matching_score', 0)
+                missing_skills = comparison_results.get('missing_skills', [])
+                missing_keywords = comparison_results.get('missing_keywords', [])
+                st.text(f"✅ Matching Score: {matching_score}/100\n\n❌ Missing Skills: {', '.join(missing_skills) if missing_skills else 'None'}\n\n❌ Missing Keywords: {', '.join(missing_keywords) if missing_keywords else 'None'}\n")
+
+                templates = select_generation_templates(
+                    selected_application_types, custom_templates, cover_letter_template_names, cover_letter_templates,
+                    referral_template, connection_note_template, selected_cover_letter_template
+                )
+                render_application_content(templates, job_details, resume_details, combined_generation)
+            elif process_button:
+                placeholder.markdown('<div class="centered">📝 Error in processing the inputs, please check the text format.</div>', unsafe_allow_html=True)
+            elif "extraction" in st.session_state.get("results", {}):
+                placeholder.markdown('<div class="centered">The inputs changed, click "Process" to update the results 🔄</div>', unsafe_allow_html=True)
             else:
                 placeholder.markdown('<div class="centered">Click "Process" to start the magic 🚀</div>', unsafe_allow_html=True)
 
+        if show_debug_panel:
+            render_debug_panel(run)
+
 if __name__ == "__main__":
     main()
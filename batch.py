@@ -0,0 +1,233 @@
+import argparse
+import json
+import os
+import sys
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, as_completed, wait
+import utils.dotenv_loader  # Loads .env before any module reads its settings
+from app import process_input, compare_extracted_details, generate_application_content, load_letter_templates, load_other_templates
+from services.resume_detail_service import extract_resume_details_from_text
+from utils.instrumentation import submit_with_context
+from utils.job_index import JobIndex, candidate_years
+from utils.llm_scheduler import BATCH, scheduling
+
+APPLICATION_TYPES = ["Cover Letter", "Referral Message", "LinkedIn Connection Request Note"]
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Score one resume against a feed of job postings.")
+    parser.add_argument("--resume", required=True, help="Path to the resume text file.")
+    parser.add_argument("--jobs", default="-", help="JSONL file with one job posting per line, '-' reads stdin (default).")
+    parser.add_argument("--output", required=True, help="JSONL file the results are appended to, also used as the checkpoint.")
+    parser.add_argument("--workers", type=int, default=8, help="Number of postings processed concurrently.")
+    parser.add_argument("--generate", nargs="*", default=[], choices=APPLICATION_TYPES, metavar="TYPE",
+                        help=f"Application content to generate per posting: {', '.join(repr(t) for t in APPLICATION_TYPES)}.")
+    parser.add_argument("--combined", action="store_true", help="Generate all selected content with a single request per posting.")
+    parser.add_argument("--cover-letter-template", help="Name of the cover letter template to use (default: the first one).")
+    parser.add_argument("--index", help="Job index file; extracted postings are added to it, and --top-k ranks against it.")
+    parser.add_argument("--top-k", type=int, help="Instead of reading --jobs, compare the resume only with the K best matching postings in --index.")
+    return parser.parse_args(argv)
+
+# Each line is either a JSON object with a "text" (or "job_posting_text"/"description") field and an optional "id", or a JSON string
+def read_job_postings(lines):
+    for line_number, line in enumerate(lines, start=1):
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            record = json.loads(line)
+        except json.JSONDecodeError as error:
+            yield f"line-{line_number}", None, f"Invalid JSON: {error}"
+            continue
+        if isinstance(record, str):
+            record = {"text": record}
+        if not isinstance(record, dict):
+            yield f"line-{line_number}", None, f"Expected a JSON object or string, got {type(record).__name__}"
+            continue
+        text = record.get("text") or record.get("job_posting_text") or record.get("description") or ""
+        yield str(record.get("id", f"line-{line_number}")), text, None
+
+# Ids of postings already written successfully by a previous (possibly crashed) run
+def load_checkpoint(output_path):
+    completed = set()
+    if not os.path.exists(output_path):
+        return completed
+
+    with open(output_path, "r", encoding="utf-8") as file:
+        for line in file:
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError:
+                # A crash can leave a partially written last line behind
+                continue
+            if "error" not in record:
+                completed.add(record["id"])
+    return completed
+
+def process_posting(posting_id, job_posting_text, resume_text, application_types, templates, combined=False):
+    if not job_posting_text:
+        return {"id": posting_id, "error": "Empty job posting"}
+
+    job_details, resume_details, comparison_results = process_input(job_posting_text, resume_text)
+    if "error" in job_details:
+        return {"id": posting_id, "error": job_details["error"], "job_details": job_details}
+
+    result = {"id": posting_id, "job_details": job_details, "comparison_results": comparison_results}
+    return add_generated_content(result, job_details, resume_details, application_types, templates, combined)
+
+# Postings coming from the index are already extracted, only the comparison and generation are left
+def process_indexed_posting(posting_id, score, job_details, resume_details, application_types, templates, combined=False):
+    result = {"id": posting_id, "index_score": score, "job_details": job_details, "comparison_results": compare_extracted_details(job_details, resume_details)}
+    return add_generated_content(result, job_details, resume_details, application_types, templates, combined)
+
+def add_generated_content(result, job_details, resume_details, application_types, templates, combined=False):
+    if application_types:
+        cover_letter_templates, cover_letter_template_names, referral_template, connection_note_template = templates
+        job_application_email, referral_message, connection_note = generate_application_content(
+            application_types, {}, cover_letter_template_names, cover_letter_templates,
+            job_details, resume_details, referral_template, connection_note_template, combined=combined
+        )
+        result.update({
+            "job_application_email": job_application_email.strip(),
+            "referral_message": referral_message,
+            "connection_note": connection_note,
+        })
+    return result
+
+def extract_resume(resume_text):
+    # Extract the resume once up front, every posting then reuses the cached extraction
+    resume_details = extract_resume_details_from_text(resume_text)
+    if "error" in resume_details:
+        raise ValueError(f"Could not extract the resume: {resume_details['error']}")
+    return resume_details
+
+def load_batch_templates(cover_letter_template=None):
+    cover_letter_templates, cover_letter_template_names = load_letter_templates()
+    if cover_letter_template:
+        if cover_letter_template not in cover_letter_template_names:
+            raise ValueError(f"Unknown cover letter template '{cover_letter_template}'")
+        cover_letter_template_names = [cover_letter_template]
+    referral_template, connection_note_template = load_other_templates()
+    return cover_letter_templates, cover_letter_template_names, referral_template, connection_note_template
+
+def run_batch(resume_text, job_lines, output_path, workers=8, application_types=(), cover_letter_template=None, combined=False, index=None):
+    # Batch calls queue behind interactive ones when they share a process with the app
+    with scheduling(priority=BATCH):
+        extract_resume(resume_text)
+        templates = load_batch_templates(cover_letter_template)
+
+        completed = load_checkpoint(output_path)
+        # Make sure a torn last line from a crash does not swallow the next record
+        if os.path.exists(output_path) and os.path.getsize(output_path):
+            with open(output_path, "rb") as file:
+                file.seek(-1, os.SEEK_END)
+                needs_newline = file.read(1) != b"\n"
+        else:
+            needs_newline = False
+
+        counts = {"processed": 0, "failed": 0, "skipped": 0}
+        started_at = time.perf_counter()
+
+        with open(output_path, "a", encoding="utf-8") as output, ThreadPoolExecutor(max_workers=workers) as executor:
+            if needs_newline:
+                output.write("\n")
+
+            running = {}
+
+            def write_result(result):
+                counts["failed" if "error" in result else "processed"] += 1
+                if index is not None and "error" not in result:
+                    index.add(result["id"], result["job_details"])
+                output.write(json.dumps(result, ensure_ascii=False) + "\n")
+                output.flush()
+
+            def write_finished(futures):
+                for future in futures:
+                    try:
+                        result = future.result()
+                    except Exception as error:
+                        result = {"id": running[future], "error": str(error)}
+                    del running[future]
+                    write_result(result)
+
+            # Keep a bounded number of postings in flight so huge feeds are streamed rather than loaded at once
+            for posting_id, job_posting_text, error in read_job_postings(job_lines):
+                if posting_id in completed:
+                    counts["skipped"] += 1
+                    continue
+                # A malformed line fails on its own instead of ending the run
+                if error:
+                    write_result({"id": posting_id, "error": error})
+                    continue
+                if len(running) >= workers * 2:
+                    done, _ = wait(running, return_when=FIRST_COMPLETED)
+                    write_finished(done)
+                future = submit_with_context(executor, process_posting, posting_id, job_posting_text, resume_text, list(application_types), templates, combined)
+                running[future] = posting_id
+
+            while running:
+                done, _ = wait(running, return_when=FIRST_COMPLETED)
+                write_finished(done)
+
+        elapsed = time.perf_counter() - started_at
+        counts["elapsed_seconds"] = round(elapsed, 2)
+        counts["postings_per_second"] = round((counts["processed"] + counts["failed"]) / elapsed, 2) if elapsed else 0.0
+        return counts
+
+# Rank every indexed posting against the resume locally, then run the comparison and generation only for the best K
+def rank_indexed_postings(resume_text, index, top_k, output_path, workers=8, application_types=(), cover_letter_template=None, combined=False):
+    # Batch calls queue behind interactive ones when they share a process with the app
+    with scheduling(priority=BATCH):
+        resume_details = extract_resume(resume_text)
+        templates = load_batch_templates(cover_letter_template)
+
+        started_at = time.perf_counter()
+        matches = index.search(resume_details, top_k=top_k, candidate_years=candidate_years(resume_text, resume_details))
+        search_seconds = time.perf_counter() - started_at
+
+        counts = {"processed": 0, "failed": 0}
+        # Results are written as they finish, a failed posting is recorded and does not stop the others
+        with open(output_path, "w", encoding="utf-8") as output, ThreadPoolExecutor(max_workers=workers) as executor:
+            running = {
+                submit_with_context(executor, process_indexed_posting, posting_id, score, job_details, resume_details, list(application_types), templates, combined): posting_id
+                for posting_id, score, job_details in matches
+            }
+            for future in as_completed(running):
+                try:
+                    result = future.result()
+                except Exception as error:
+                    result = {"id": running[future], "error": str(error)}
+                counts["failed" if "error" in result else "processed"] += 1
+                output.write(json.dumps(result, ensure_ascii=False) + "\n")
+                output.flush()
+
+        return {"indexed": len(index), "ranked": len(matches), "failed": counts["failed"], "search_ms": round(search_seconds * 1000, 2)}
+
+def main(argv=None):
+    args = parse_args(argv)
+
+    with open(args.resume, "r", encoding="utf-8") as file:
+        resume_text = file.read()
+
+    index = JobIndex(args.index) if args.index else None
+    if args.top_k:
+        if index is None:
+            raise SystemExit("--top-k needs --index")
+        counts = rank_indexed_postings(resume_text, index, args.top_k, args.output, args.workers, args.generate, args.cover_letter_template, args.combined)
+        print(f"Ranked {counts['indexed']} indexed postings in {counts['search_ms']} ms, compared the best {counts['ranked']} ({counts['failed']} failed)", file=sys.stderr)
+        return
+
+    job_file = sys.stdin if args.jobs == "-" else open(args.jobs, "r", encoding="utf-8")
+    try:
+        counts = run_batch(resume_text, job_file, args.output, args.workers, args.generate, args.cover_letter_template, args.combined, index)
+    finally:
+        if job_file is not sys.stdin:
+            job_file.close()
+
+    print(
+        f"Processed {counts['processed']} postings ({counts['failed']} failed, {counts['skipped']} already done) "
+        f"in {counts['elapsed_seconds']}s: {counts['postings_per_second']} postings/sec",
+        file=sys.stderr,
+    )
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,156 @@
+import argparse
+import itertools
+import json
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+# Runs must not be served from an earlier run's cache unless asked to
+os.environ.setdefault("RESULT_CACHE_PATH", "")
+# The stub only sends rate-limit headers with --rate-limit, until then the scheduler must not be the bottleneck
+os.environ.setdefault("LLM_REQUESTS_PER_SECOND", "1000")
+
+import utils.dotenv_loader  # Loads .env before any module reads its settings
+from app import process_input, generate_application_content, load_letter_templates, load_other_templates
+from benchmarks.stub_llm import StubChatModel
+from models.llm import set_llm_factory
+from utils.instrumentation import start_run, submit_with_context
+
+APPLICATION_TYPES = ["Cover Letter", "Referral Message", "LinkedIn Connection Request Note"]
+
+# Unique across all levels of one benchmark, so no run is served from another run's cached results
+_run_numbers = itertools.count()
+
+# Number of times the base text is repeated for each input size
+INPUT_SIZES = {"small": 1, "medium": 4, "large": 16}
+
+BASE_JOB_POSTING = """
+Senior Backend Engineer - Acme Analytics (Berlin, Hybrid)
+We are looking for an engineer with 5+ years of experience in Python, Django, PostgreSQL and AWS.
+You will design microservices, own our Kafka based data pipelines and mentor other engineers.
+Benefits: health insurance, 30 days vacation, learning budget. Apply at https://acme-analytics.example/careers/1234.
+"""
+
+BASE_RESUME = """
+Alex Doe - Backend Engineer - alex.doe@example.com - +49 151 0000000 - https://github.com/alexdoe
+Experience: Backend Engineer at Globex (2020 - present), building Python services on AWS with Docker and Terraform.
+Education: Master's in Computer Science, Technical University of Munich.
+Projects: event ingestion pipeline handling 50k events/s. Certifications: AWS Certified Developer.
+"""
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the Process pipeline against a local stub model.")
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 4, 16], help="Concurrent runs to measure.")
+    parser.add_argument("--runs", type=int, default=32, help="Runs per concurrency level and input size.")
+    parser.add_argument("--input-sizes", nargs="+", default=["small", "large"], choices=list(INPUT_SIZES))
+    parser.add_argument("--generate", nargs="*", default=APPLICATION_TYPES, choices=APPLICATION_TYPES, metavar="TYPE")
+    parser.add_argument("--combined", action="store_true", help="Use combined generation.")
+    parser.add_argument("--warm-cache", action="store_true", help="Reuse the same inputs for every run so the result cache can hit.")
+    parser.add_argument("--latency-ms", type=float, default=400.0, help="Median time to first token of the stub model.")
+    parser.add_argument("--latency-sigma", type=float, default=0.35, help="Spread of the log-normal latency distribution.")
+    parser.add_argument("--tokens-per-second", type=float, default=120.0, help="Output rate of the stub model.")
+    parser.add_argument("--failure-rate", type=float, default=0.0, help="Share of stub calls that raise an error.")
+    parser.add_argument("--malformed-rate", type=float, default=0.0, help="Share of structured stub answers that are truncated JSON.")
+    parser.add_argument("--rate-limit", type=int, default=0, help="Requests per second the stub accepts before answering 429 (0: no limit).")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="Write the results as JSON to this file, to compare between commits.")
+    return parser.parse_args(argv)
+
+def percentile(values, fraction):
+    ordered = sorted(values)
+    if not ordered:
+        return 0.0
+    index = min(len(ordered) - 1, max(0, int(round(fraction * len(ordered) + 0.5)) - 1))
+    return ordered[index]
+
+def run_once(run_number, size, args, templates):
+    cover_letter_templates, cover_letter_template_names, referral_template, connection_note_template = templates
+    suffix = "" if args.warm_cache else f"\nReference: {run_number}"
+    job_posting_text = BASE_JOB_POSTING * INPUT_SIZES[size] + suffix
+    resume_text = BASE_RESUME * INPUT_SIZES[size] + suffix
+
+    run = start_run()
+    started_at = time.perf_counter()
+    try:
+        job_details, resume_details, comparison_results = process_input(job_posting_text, resume_text)
+        if args.generate:
+            generate_application_content(
+                args.generate, {}, cover_letter_template_names, cover_letter_templates,
+                job_details, resume_details, referral_template, connection_note_template, combined=args.combined
+            )
+        failed = "error" in job_details or "error" in resume_details
+    except Exception:
+        failed = True
+    latency = time.perf_counter() - started_at
+
+    llm_calls = [record for record in run.records if record["kind"] == "llm"]
+    return {
+        "latency": latency,
+        "failed": failed,
+        "llm_calls": len(llm_calls),
+        "failed_calls": sum(1 for record in llm_calls if record["error"]),
+        "prompt_tokens": sum(record["prompt_tokens"] or 0 for record in llm_calls),
+        "completion_tokens": sum(record["completion_tokens"] or 0 for record in llm_calls),
+    }
+
+def run_level(concurrency, size, args, templates):
+    started_at = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        futures = [submit_with_context(executor, run_once, next(_run_numbers), size, args, templates) for _ in range(args.runs)]
+        results = [future.result() for future in futures]
+    elapsed = time.perf_counter() - started_at
+
+    latencies = [result["latency"] for result in results]
+    return {
+        "concurrency": concurrency,
+        "input_size": size,
+        "runs": len(results),
+        "failed_runs": sum(result["failed"] for result in results),
+        "p50_seconds": round(percentile(latencies, 0.50), 4),
+        "p95_seconds": round(percentile(latencies, 0.95), 4),
+        "p99_seconds": round(percentile(latencies, 0.99), 4),
+        "llm_calls_per_run": round(sum(result["llm_calls"] for result in results) / len(results), 2),
+        "failed_calls_per_run": round(sum(result["failed_calls"] for result in results) / len(results), 2),
+        "prompt_tokens_per_run": round(sum(result["prompt_tokens"] for result in results) / len(results)),
+        "completion_tokens_per_run": round(sum(result["completion_tokens"] for result in results) / len(results)),
+        "runs_per_second": round(len(results) / elapsed, 3),
+    }
+
+def main(argv=None):
+    args = parse_args(argv)
+
+    model = StubChatModel(
+        latency_ms=args.latency_ms,
+        latency_sigma=args.latency_sigma,
+        tokens_per_second=args.tokens_per_second,
+        failure_rate=args.failure_rate,
+        malformed_rate=args.malformed_rate,
+        seed=args.seed,
+        rate_limit=args.rate_limit,
+    )
+    set_llm_factory(lambda service, config: model)
+
+    cover_letter_templates, cover_letter_template_names = load_letter_templates()
+    referral_template, connection_note_template = load_other_templates()
+    templates = (cover_letter_templates, cover_letter_template_names, referral_template, connection_note_template)
+
+    rows = []
+    header = f"{'size':<8}{'conc':>6}{'runs':>6}{'fail':>6}{'p50 s':>9}{'p95 s':>9}{'p99 s':>9}{'calls/run':>11}{'fail/run':>10}{'in tok/run':>12}{'out tok/run':>13}{'runs/s':>9}"
+    print(header)
+    for size in args.input_sizes:
+        for concurrency in args.concurrency:
+            row = run_level(concurrency, size, args, templates)
+            rows.append(row)
+            print(
+                f"{size:<8}{concurrency:>6}{row['runs']:>6}{row['failed_runs']:>6}{row['p50_seconds']:>9}{row['p95_seconds']:>9}"
+                f"{row['p99_seconds']:>9}{row['llm_calls_per_run']:>11}{row['failed_calls_per_run']:>10}{row['prompt_tokens_per_run']:>12}{row['completion_tokens_per_run']:>13}{row['runs_per_second']:>9}"
+            )
+            sys.stdout.flush()
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as file:
+            json.dump({"settings": vars(args), "results": rows}, file, indent=4)
+
+if __name__ == "__main__":
+    main()
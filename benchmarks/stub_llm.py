@@ -0,0 +1,188 @@
+import asyncio
+import json
+import math
+import random
+import re
+import threading
+import time
+
+# Deterministic local stand-in for the chat model, so the pipeline can be measured without calling Together AI.
+# It recognises the prompts of each service and answers with canned output of a realistic size.
+
+CANNED_JOB_DETAILS = {
+    "company_name": "Acme Analytics",
+    "role": "Senior Backend Engineer",
+    "years_of_experience_required": "5+ years",
+    "contact_email": "careers@acme-analytics.example",
+    "apply_link": "https://acme-analytics.example/careers/1234",
+    "skills": ["Python", "Django", "PostgreSQL", "AWS", "Docker", "Kubernetes", "REST APIs", "Kafka"],
+    "keywords": ["microservices", "scalability", "CI/CD", "agile", "data pipelines"],
+    "job_location": "Berlin, Germany (Hybrid)",
+    "salary_range": "EUR 75,000 - 95,000",
+    "employment_type": "Full-time",
+    "work_schedule": "Hybrid, 3 days in office",
+    "company_description": "Acme Analytics builds real-time analytics products for retailers.",
+    "benefits": ["Health insurance", "30 days vacation", "Learning budget"],
+    "education_requirements": "Bachelor's degree in Computer Science or related field",
+    "certifications_required": [],
+    "job_responsibilities": ["Design and build backend services", "Own the data ingestion platform", "Mentor engineers"],
+    "desired_qualities": ["Ownership", "Communication", "Curiosity"],
+    "career_growth_opportunities": "Path to Staff Engineer",
+    "application_deadline": "2025-12-31",
+    "company_website": "https://acme-analytics.example",
+    "recruiter_name": "Jordan Lee",
+    "recruiter_contact_info": "jordan.lee@acme-analytics.example",
+}
+
+CANNED_RESUME_DETAILS = {
+    "applicant_name": "Alex Doe",
+    "skills": ["Python", "Flask", "Postgres", "Amazon Web Services", "Docker", "Terraform", "GraphQL"],
+    "keywords": ["microservices", "agile", "event-driven architecture"],
+    "latest_education": "Master's in Computer Science",
+    "latest_college_name": "Technical University of Munich",
+    "current_company": "Globex",
+    "current_role": "Backend Engineer",
+    "contact_information": {"phone": "+49 151 0000000", "email": "alex.doe@example.com", "linkedin": "https://linkedin.com/in/alexdoe"},
+    "work_experience": [{"title": "Backend Engineer", "company": "Globex", "duration": "2020 - present"}],
+    "certifications": ["AWS Certified Developer"],
+    "languages": ["English (fluent)", "German (B2)"],
+    "achievements": ["Cut API latency by 40%"],
+    "projects": ["Event ingestion pipeline handling 50k events/s"],
+    "location": "Munich, Germany",
+    "hobbies_interests": ["Climbing"],
+    "volunteer_experience": [],
+    "references": [],
+    "social_media_profiles": ["https://github.com/alexdoe"],
+}
+
+GENERATED_TEXT = (
+    "Dear Hiring Team,\n\nI am excited to apply for the Senior Backend Engineer position at Acme Analytics. "
+    "In my current role as a Backend Engineer at Globex I design and operate Python services on AWS, and I recently "
+    "cut API latency by 40% while scaling our event ingestion pipeline to 50k events per second. "
+    "I would welcome the chance to bring the same ownership to your data platform.\n\nBest regards,\nAlex Doe"
+)
+
+class StubLLMError(RuntimeError):
+    def __init__(self, message, status_code=500, headers=None):
+        super().__init__(message)
+        self.status_code = status_code
+        self.headers = headers or {}
+
+class StubMessage:
+    def __init__(self, content, prompt_tokens=0, completion_tokens=0, headers=None):
+        self.content = content
+        self.usage_metadata = {
+            "input_tokens": prompt_tokens,
+            "output_tokens": completion_tokens,
+            "total_tokens": prompt_tokens + completion_tokens,
+        } if prompt_tokens or completion_tokens else {}
+        self.response_metadata = {"headers": headers} if headers else {}
+
+# Only answer with the fields an extraction prompt lists, like a real model would
+def requested_fields(prompt, canned):
+    listed = set(re.findall(r'^\s*- "(\w+)":', prompt, re.MULTILINE))
+    return {key: value for key, value in canned.items() if key in listed} if listed else canned
+
+def estimate_tokens(text):
+    return max(1, len(text) // 4)
+
+class StubChatModel:
+    # latency_ms: median time to first token, latency_sigma: spread of the log-normal latency distribution,
+    # tokens_per_second: output rate after the first token, failure_rate / malformed_rate: share of calls that
+    # raise an error / answer with broken JSON, rate_limit: requests per second accepted before answering 429
+    def __init__(self, latency_ms=400.0, latency_sigma=0.35, tokens_per_second=120.0, failure_rate=0.0, malformed_rate=0.0, seed=0, rate_limit=0):
+        self.latency_ms = latency_ms
+        self.latency_sigma = latency_sigma
+        self.tokens_per_second = tokens_per_second
+        self.failure_rate = failure_rate
+        self.malformed_rate = malformed_rate
+        self.rate_limit = rate_limit
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self._window_started_at = time.monotonic()
+        self._window_requests = 0
+        self.calls = 0
+        self.rate_limited = 0
+
+    def bind(self, **kwargs):
+        return self
+
+    def _draw(self):
+        with self._lock:
+            self.calls += 1
+            first_token_delay = self.latency_ms / 1000.0 * math.exp(self._random.gauss(0.0, self.latency_sigma)) if self.latency_ms else 0.0
+            return first_token_delay, self._random.random() < self.failure_rate, self._random.random() < self.malformed_rate
+
+    # Fixed one-second window like the provider's, with the same rate-limit headers on answers and 429s
+    def _admit(self):
+        if not self.rate_limit:
+            return None
+        with self._lock:
+            now = time.monotonic()
+            if now - self._window_started_at >= 1.0:
+                self._window_started_at = now
+                self._window_requests = 0
+            reset = max(0.0, 1.0 - (now - self._window_started_at))
+            headers = {
+                "x-ratelimit-limit": str(self.rate_limit),
+                "x-ratelimit-remaining": str(max(0, self.rate_limit - self._window_requests - 1)),
+                "x-ratelimit-reset": f"{reset:.3f}",
+            }
+            if self._window_requests >= self.rate_limit:
+                self.rate_limited += 1
+                raise StubLLMError("Rate limit exceeded", status_code=429, headers=dict(headers, **{"x-ratelimit-remaining": "0", "retry-after": f"{reset:.3f}"}))
+            self._window_requests += 1
+            return headers
+
+    def _answer(self, prompt, malformed):
+        structured = True
+        if "exactly these keys:" in prompt:
+            keys = json.loads(re.search(r"exactly these keys: (\[.*?\])", prompt).group(1))
+            content = json.dumps({key: GENERATED_TEXT for key in keys})
+        elif "Extract the following details from the job posting" in prompt:
+            content = json.dumps(requested_fields(prompt, CANNED_JOB_DETAILS))
+        elif "Extract the following details from the resume" in prompt:
+            content = json.dumps(requested_fields(prompt, CANNED_RESUME_DETAILS))
+        elif "Unmatched job description terms" in prompt:
+            content = json.dumps({"covered_terms": []})
+        elif "supposed to be a single valid JSON object" in prompt:
+            content = json.dumps(CANNED_JOB_DETAILS)
+        else:
+            structured = False
+            content = GENERATED_TEXT
+
+        if malformed and structured:
+            # Cut the answer off mid-value, the way a length-limited response ends
+            content = "```json\n" + content[: max(1, int(len(content) * 0.6))]
+        return content
+
+    def _check_failure(self, failed):
+        if failed:
+            raise StubLLMError("Stub model failure", status_code=500)
+
+    def invoke(self, input=None, **kwargs):
+        headers = self._admit()
+        first_token_delay, failed, malformed = self._draw()
+        content = self._answer(str(input), malformed)
+        completion_tokens = estimate_tokens(content)
+        time.sleep(first_token_delay + (completion_tokens / self.tokens_per_second if self.tokens_per_second else 0.0))
+        self._check_failure(failed)
+        return StubMessage(content, estimate_tokens(str(input)), completion_tokens, headers=headers)
+
+    def stream(self, input=None, **kwargs):
+        headers = self._admit()
+        first_token_delay, failed, malformed = self._draw()
+        content = self._answer(str(input), malformed)
+        time.sleep(first_token_delay)
+        self._check_failure(failed)
+
+        words = re.findall(r"\S+\s*", content)
+        for index, word in enumerate(words):
+            if self.tokens_per_second:
+                time.sleep(estimate_tokens(word) / self.tokens_per_second)
+            yield StubMessage(word, headers=headers if index == 0 else None)
+        # Usage arrives on the last chunk, like a real stream with stream_usage enabled
+        yield StubMessage("", estimate_tokens(str(input)), estimate_tokens(content))
+
+    async def ainvoke(self, input=None, **kwargs):
+        return await asyncio.to_thread(self.invoke, input, **kwargs)
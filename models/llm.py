@@ -1,13 +1,98 @@
 import os
-from dotenv import load_dotenv
-from langchain_together import ChatTogether
-
-# Load environment variables
-load_dotenv(".env", override=True)
-
-# Initialize the language model
-llm = ChatTogether(
-    together_api_key=os.getenv("TOGETHER_API_KEY"),
-    model=os.getenv("TOGETHER_MODEL"),
-    temperature=0.5
-)
+from functools import lru_cache
+from utils.dotenv_loader import load_environment_variables
+from utils.instrumentation import InstrumentedLLM
+from utils.llm_scheduler import ScheduledLLM
+
+# Services that talk to the model, each can override the defaults below with
+# <SERVICE>_MODEL, <SERVICE>_FAST_MODEL, <SERVICE>_TEMPERATURE, <SERVICE>_TIMEOUT and <SERVICE>_MAX_RETRIES (e.g. JOB_DETAILS_MODEL).
+# Retries are done by utils.llm_scheduler, not by the client.
+SERVICES = ("job_details", "resume_details", "comparison", "cover_letter", "referral", "connection_note", "combined_generation")
+
+# Structured extraction runs deterministically and may be tried on LLM_FAST_MODEL first, see utils.structured_output.
+# Generation keeps LLM_TEMPERATURE and only uses a fast model when one is set for the service itself.
+EXTRACTION_SERVICES = ("job_details", "resume_details", "comparison")
+EXTRACTION_TEMPERATURE = "0"
+
+DEFAULT_TEMPERATURE = "0.5"
+DEFAULT_TIMEOUT = "60"
+DEFAULT_MAX_RETRIES = "2"
+
+# Size of the keep-alive connection pool shared by every client in the process
+MAX_CONNECTIONS = int(os.getenv("LLM_MAX_CONNECTIONS", "20"))
+
+def get_service_config(service=None):
+    load_environment_variables()
+
+    def setting(name, default, shared=True):
+        if service and os.getenv(f"{service.upper()}_{name}"):
+            return os.getenv(f"{service.upper()}_{name}")
+        return os.getenv(f"LLM_{name}", default) if shared else default
+
+    extraction = service in EXTRACTION_SERVICES
+    return {
+        "model": setting("MODEL", os.getenv("TOGETHER_MODEL")),
+        "fast_model": setting("FAST_MODEL", None, shared=extraction),
+        "temperature": float(setting("TEMPERATURE", EXTRACTION_TEMPERATURE, shared=False) if extraction else setting("TEMPERATURE", DEFAULT_TEMPERATURE)),
+        "timeout": float(setting("TIMEOUT", DEFAULT_TIMEOUT)),
+        "max_retries": int(setting("MAX_RETRIES", DEFAULT_MAX_RETRIES)),
+    }
+
+@lru_cache(maxsize=None)
+def get_http_clients():
+    import httpx
+
+    limits = httpx.Limits(max_connections=MAX_CONNECTIONS, max_keepalive_connections=MAX_CONNECTIONS)
+    return httpx.Client(limits=limits), httpx.AsyncClient(limits=limits)
+
+@lru_cache(maxsize=None)
+def _build_llm(model, temperature, timeout):
+    # Imported here so importing a service does not pay for loading the LangChain stack
+    from langchain_together import ChatTogether
+
+    http_client, http_async_client = get_http_clients()
+    return ChatTogether(
+        together_api_key=os.getenv("TOGETHER_API_KEY"),
+        model=model,
+        temperature=temperature,
+        timeout=timeout,
+        max_retries=0,
+        stream_usage=True,
+        # The scheduler tunes its rate limit from these
+        include_response_headers=True,
+        http_client=http_client,
+        http_async_client=http_async_client
+    )
+
+# Replaces the real client, e.g. with the local stub model used by the benchmarks; called as factory(service, config)
+_llm_factory = None
+
+def set_llm_factory(factory):
+    global _llm_factory
+    _llm_factory = factory
+
+# Return the chat model for a service, built on first use and reused for the lifetime of the process.
+# Clients with the same configuration are shared, and all of them share one connection pool.
+# Calls made through the returned model are recorded under the service name by utils.instrumentation, and wait for
+# their turn, are rate limited and retried by utils.llm_scheduler.
+# `fast=True` returns the service's fast model instead (recorded as "<service>:fast"), or None when it has none.
+def get_llm(service=None, fast=False):
+    config = get_service_config(service)
+    stage = service or "default"
+    if fast:
+        if not config["fast_model"]:
+            return None
+        config = dict(config, model=config["fast_model"])
+        stage = f"{stage}:fast"
+
+    if _llm_factory is not None:
+        llm = _llm_factory(service, config)
+    else:
+        llm = _build_llm(config["model"], config["temperature"], config["timeout"])
+    return ScheduledLLM(InstrumentedLLM(llm, stage), service, config["max_retries"])
+
+# Keep `from models.llm import llm` working, the default client is only built when it is first accessed
+def __getattr__(name):
+    if name == "llm":
+        return get_llm()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -0,0 +1,61 @@
+import json
+from services.email_service import generate_job_application_email_dynamic
+from services.referral_service import generate_job_referral_dynamic
+from services.connection_note_service import generate_connection_note_dynamic
+from utils.structured_output import invoke_json
+from utils.template_fields import compact_json, project_details_for_templates
+
+# Artifact key -> (what the model is asked to write, per-artifact generator used as the fallback)
+ARTIFACTS = {
+    "job_application_email": ("a cover letter", generate_job_application_email_dynamic),
+    "referral_message": ("a referral request message", generate_job_referral_dynamic),
+    "connection_note": ("a LinkedIn connection request note", generate_connection_note_dynamic),
+}
+
+def build_combined_prompt(templates, resume_details, job_details):
+    resume_details, job_details = project_details_for_templates(templates.values(), resume_details, job_details)
+    template_sections = "\n\n".join(
+        f'    Template for "{name}" ({ARTIFACTS[name][0]}):\n    {template}' for name, template in templates.items()
+    )
+
+    return f"""
+{template_sections}
+
+    Resume Details:
+    {compact_json(resume_details)}
+
+    Job Description Details:
+    {compact_json(job_details)}
+
+    Instructions:
+    Write every message listed above using its own template, the resume details and the job description. Follow these instructions strictly:
+
+    1. **Strict Adherence to Template**:
+    - Follow the structure, format, and tone of each template exactly.
+    - Use the resume and job description details to fill in the sections of each template, ensuring that the content aligns with the job description and highlights relevant skills and experiences from the resume.
+
+    2. **Content**:
+    - Only include information that is available in the resume or job description. If any field (such as personal details, specific skills, or other job-related information) is missing, it should be excluded from the final message.
+    - If a template contains any placeholders for which no corresponding information is available, remove those placeholders from the message.
+
+    3. **Final Output**:
+    - Output **ONLY** a JSON object, without any extra text, code, or explanation.
+    - The JSON object must have exactly these keys: {json.dumps(list(templates))}, each holding the completed message as a string.
+    """
+
+# Generate all selected artifacts with a single request, falling back to one request per artifact
+# for anything the combined response does not provide
+def generate_application_content_combined(templates, resume_details, job_details):
+    results = {}
+    if len(templates) > 1:
+        prompt = build_combined_prompt(templates, resume_details, job_details)
+        # Missing or unparsable artifacts are generated separately below, so no repair round-trip here
+        parsed = invoke_json("combined_generation", prompt, repair=False)
+
+        results = {name: parsed[name].strip() for name in templates if isinstance(parsed.get(name), str) and parsed[name].strip()}
+
+    for name, template in templates.items():
+        if name not in results:
+            results[name] = ARTIFACTS[name][1](template, resume_details, job_details)
+
+    return results
@@ -1,40 +1,52 @@
 import json
-from models.llm import llm
+import os
+from utils.result_cache import cached_result
+from utils.skill_matcher import match_resume_to_job
+from utils.structured_output import invoke_json
 
-def compare_resume_and_job_description(resume_json, job_json):
+PROMPT_VERSION = "3"
+
+# Ask the LLM about terms the local matcher could not resolve, off by default to keep the comparison local
+LLM_FALLBACK = os.getenv("COMPARISON_LLM_FALLBACK", "false").lower() in ("1", "true", "yes")
+
+@cached_result("comparison_fallback", PROMPT_VERSION, service="comparison")
+def resolve_unmatched_terms(resume_terms, unmatched_terms):
     prompt = f"""
-    You are given two JSON objects: one containing skills and keywords from a resume, and the other from a job description.
-    Compare them and provide the result **ONLY** in JSON format, without any extra text, code, or explanation.
+    You are given the skills and keywords from a resume, and a list of skills and keywords from a job description that could not be matched by name.
+    Return **ONLY** a JSON object, without any extra text, code, or explanation.
 
-    Resume JSON:
-    {json.dumps(resume_json, indent=4)}
+    Resume skills and keywords:
+    {json.dumps(resume_terms)}
 
-    Job Description JSON:
-    {json.dumps(job_json, indent=4)}
+    Unmatched job description terms:
+    {json.dumps(unmatched_terms)}
 
     Task:
-    - Compare the skills and keywords between the resume and job description.
-    - Calculate a matching score out of 100, reflecting how well the resume matches the job description.
-    - Identify the skills and keywords from the job description that are missing in the resume.
-    - Consider variations in skill/keyword names (e.g., "JavaScript" vs "JS", "AWS" vs "Amazon Web Services") and treat them as matches.
-    - The matching score should account for exact matches, partial matches (such as abbreviations or synonyms), and the overall relevance of the skills in the context of the job description.
-    
+    - For each unmatched term, decide whether the resume covers it through a synonym, abbreviation, closely related technology or a broader/narrower skill.
+    - Only use the terms listed above.
+
     The response should contain:
-    - "matching_score": <matching_score_out_of_100>
-    - "missing_skills": <list_of_skills_missing_in_resume>
-    - "missing_keywords": <list_of_keywords_missing_in_resume>
+    - "covered_terms": <list_of_unmatched_terms_covered_by_the_resume>
     """
 
-    response = llm.invoke(input=prompt)
-    response_content = response.content if hasattr(response, 'content') else str(response)
-    cleaned_response = response_content.strip("```").strip()
-
-    if cleaned_response.startswith('json\n'):
-        cleaned_response = cleaned_response[5:].strip()
-
-    try:
-        comparison_results = json.loads(cleaned_response)
-    except json.JSONDecodeError:
-        comparison_results = {"error": "Failed to parse the response into JSON", "response": cleaned_response}
+    return invoke_json("comparison", prompt, expected_keys=("covered_terms",))
+
+def compare_resume_and_job_description(resume_json, job_json, llm_fallback=None):
+    # Alias, token and fuzzy matching of skills and keywords runs locally
+    comparison_results = match_resume_to_job(resume_json, job_json)
+
+    if llm_fallback is None:
+        llm_fallback = LLM_FALLBACK
+    unmatched_terms = comparison_results["missing_skills"] + comparison_results["missing_keywords"]
+    if not llm_fallback or not unmatched_terms:
+        return comparison_results
+
+    resume_terms = list(resume_json.get("skills") or []) + list(resume_json.get("keywords") or [])
+    resolution = resolve_unmatched_terms(resume_terms, unmatched_terms)
+    # The model may answer null, a bare string or non-string items, none of which name a covered term
+    answered = resolution.get("covered_terms") or []
+    covered_terms = [term for term in answered if isinstance(term, str) and term in unmatched_terms] if isinstance(answered, list) else []
+    if covered_terms:
+        comparison_results = match_resume_to_job(resume_json, job_json, resolved_terms=covered_terms)
 
     return comparison_results
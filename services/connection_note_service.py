@@ -1,16 +1,18 @@
-import json
-from models.llm import llm
+from models.llm import get_llm
+from utils.template_fields import compact_json, project_details_for_template
 
-def generate_connection_note_dynamic(connection_note_template, resume_details, job_details):
-    prompt = f"""
+def build_connection_note_prompt(connection_note_template, resume_details, job_details):
+    resume_details, job_details = project_details_for_template(connection_note_template, resume_details, job_details)
+
+    return f"""
     Connection note template: 
     {connection_note_template}
 
     Resume Details:
-    {json.dumps(resume_details, indent=4)}
+    {compact_json(resume_details)}
 
     Job Description Details:
-    {json.dumps(job_details, indent=4)}
+    {compact_json(job_details)}
 
     Instructions:
     Create a LinkedIn connection request note using the provided resume details, job description, and connection note template. Follow these instructions strictly:
@@ -31,8 +33,17 @@ def generate_connection_note_dynamic(connection_note_template, resume_details, j
     - Output only the completed connection request note, adhering strictly to the provided template. Do not add any explanations, additional content, or modifications beyond the template structure.
     """
 
-    response = llm.invoke(input=prompt)
+def generate_connection_note_dynamic(connection_note_template, resume_details, job_details):
+    prompt = build_connection_note_prompt(connection_note_template, resume_details, job_details)
+
+    response = get_llm("connection_note").invoke(input=prompt)
     
     note_content = response.content if hasattr(response, 'content') else str(response)
     
     return note_content.strip()
+
+def stream_connection_note_dynamic(connection_note_template, resume_details, job_details):
+    prompt = build_connection_note_prompt(connection_note_template, resume_details, job_details)
+
+    for chunk in get_llm("connection_note").stream(input=prompt):
+        yield chunk.content if hasattr(chunk, 'content') else str(chunk)
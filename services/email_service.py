@@ -1,16 +1,18 @@
-import json
-from models.llm import llm
+from models.llm import get_llm
+from utils.template_fields import compact_json, project_details_for_template
 
-def generate_job_application_email_dynamic(letter_template, resume_details, job_details):
-    prompt = f"""
+def build_job_application_email_prompt(letter_template, resume_details, job_details):
+    resume_details, job_details = project_details_for_template(letter_template, resume_details, job_details)
+
+    return f"""
     Letter template: 
     {letter_template}
 
     Resume Details:
-    {json.dumps(resume_details, indent=4)}
+    {compact_json(resume_details)}
 
     Job Description Details:
-    {json.dumps(job_details, indent=4)}
+    {compact_json(job_details)}
 
     Instructions:
     Generate a cover letter using the provided letter template, resume details, and job description. Follow these instructions **strictly**:
@@ -31,8 +33,18 @@ def generate_job_application_email_dynamic(letter_template, resume_details, job_
 
     3. **Final Output**: Output **only** the completed letter, adhering **strictly** to the provided template. Do not include any explanations, placeholders, or additional information.
     """
-    response = llm.invoke(input=prompt)
+
+def generate_job_application_email_dynamic(letter_template, resume_details, job_details):
+    prompt = build_job_application_email_prompt(letter_template, resume_details, job_details)
+
+    response = get_llm("cover_letter").invoke(input=prompt)
     
     email_content = response.content if hasattr(response, 'content') else str(response)
     
     return email_content.strip()
+
+def stream_job_application_email_dynamic(letter_template, resume_details, job_details):
+    prompt = build_job_application_email_prompt(letter_template, resume_details, job_details)
+
+    for chunk in get_llm("cover_letter").stream(input=prompt):
+        yield chunk.content if hasattr(chunk, 'content') else str(chunk)
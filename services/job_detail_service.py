@@ -1,45 +1,96 @@
-import json
-from models.llm import llm
+from utils.field_extractor import pre_extract_job_fields
+from utils.result_cache import cached_result
+from utils.sectioned_extraction import HEADER_SECTION, extract_by_chunks, extract_by_section
+from utils.structured_output import format_field_list, invoke_json
 
-def extract_job_details_from_text(job_description_text):
+# Bump whenever the prompt changes so cached results of the old prompt are not reused
+PROMPT_VERSION = "4"
+
+# A whole-posting answer without these is not accepted from the fast model
+JOB_REQUIRED_FIELDS = ("company_name", "role")
+
+JOB_DETAIL_FIELDS = {
+    "company_name": "The name of the company.",
+    "role": "The job title or role.",
+    "years_of_experience_required": "The number of years of experience required (if specified).",
+    "contact_email": "The contact email address (if available).",
+    "apply_link": "The application link (if available).",
+    "skills": "An array of skills mentioned in the job description.",
+    "keywords": "An array of important keywords mentioned in the job description.",
+    "job_location": "The location or region where the job is based.",
+    "salary_range": "Any salary range or compensation details mentioned.",
+    "employment_type": "The type of employment (e.g., full-time, part-time, contract, internship).",
+    "work_schedule": "Any details about the work schedule (e.g., remote, hybrid, shift timings).",
+    "company_description": "A brief overview of the company or its industry.",
+    "benefits": "Any benefits or perks offered (e.g., health insurance, retirement plans).",
+    "education_requirements": "Specific education qualifications or degrees required.",
+    "certifications_required": "Any specific certifications required for the role.",
+    "job_responsibilities": "A list of key job responsibilities or duties.",
+    "desired_qualities": "Soft skills or personal qualities desired in the candidate.",
+    "career_growth_opportunities": "Information about potential growth and development within the company.",
+    "application_deadline": "The deadline for submitting the application (if provided).",
+    "company_website": "The company's website or link to more information.",
+    "recruiter_name": "Name of the recruiter or hiring manager (if available).",
+    "recruiter_contact_info": "Contact details for the recruiter (if available).",
+}
+
+# Posting section -> (headings that start it, fields extracted from it), in the order conflicting values are resolved
+JOB_SECTIONS = {
+    HEADER_SECTION: ((), ["company_name", "role", "job_location", "employment_type", "work_schedule", "salary_range", "keywords"]),
+    "requirements": (
+        (
+            "requirements", "qualifications", "minimum qualifications", "preferred qualifications", "what you bring",
+            "what we're looking for", "what we are looking for", "who you are", "about you", "must have", "nice to have", "skills",
+        ),
+        ["skills", "keywords", "years_of_experience_required", "education_requirements", "certifications_required", "desired_qualities"],
+    ),
+    "responsibilities": (
+        ("responsibilities", "key responsibilities", "what you'll do", "what you will do", "your role", "the role", "duties", "job description"),
+        ["job_responsibilities", "skills", "keywords"],
+    ),
+    "about": (("about us", "about the company", "who we are", "company overview", "our company"), ["company_description", "company_name", "company_website"]),
+    "benefits": (("benefits", "perks", "perks and benefits", "what we offer", "compensation", "why join us"), ["benefits", "salary_range", "career_growth_opportunities", "work_schedule"]),
+    "application": (
+        ("how to apply", "application process", "to apply", "contact"),
+        ["apply_link", "contact_email", "application_deadline", "recruiter_name", "recruiter_contact_info"],
+    ),
+}
+
+@cached_result("job_section", PROMPT_VERSION, service="job_details")
+def extract_job_section(section, section_text, fields):
+    section_fields = {field: JOB_DETAIL_FIELDS[field] for field in fields}
     prompt = f"""
-    Extract the following details from the job posting in JSON format only. 
+    Extract the following details from the job posting section "{section}" in JSON format only. Use null or an empty array for details this section does not mention.
     Do not include any extra text, explanations, or formatting outside of the JSON:
-    - "company_name": The name of the company.
-    - "role": The job title or role.
-    - "years_of_experience_required": The number of years of experience required (if specified).
-    - "contact_email": The contact email address (if available).
-    - "apply_link": The application link (if available).
-    - "skills": An array of skills mentioned in the job description.
-    - "keywords": An array of important keywords mentioned in the job description.
-    - "job_location": The location or region where the job is based.
-    - "salary_range": Any salary range or compensation details mentioned.
-    - "employment_type": The type of employment (e.g., full-time, part-time, contract, internship).
-    - "work_schedule": Any details about the work schedule (e.g., remote, hybrid, shift timings).
-    - "company_description": A brief overview of the company or its industry.
-    - "benefits": Any benefits or perks offered (e.g., health insurance, retirement plans).
-    - "education_requirements": Specific education qualifications or degrees required.
-    - "certifications_required": Any specific certifications required for the role.
-    - "job_responsibilities": A list of key job responsibilities or duties.
-    - "desired_qualities": Soft skills or personal qualities desired in the candidate.
-    - "career_growth_opportunities": Information about potential growth and development within the company.
-    - "application_deadline": The deadline for submitting the application (if provided).
-    - "company_website": The company's website or link to more information.
-    - "recruiter_name": Name of the recruiter or hiring manager (if available).
-    - "recruiter_contact_info": Contact details for the recruiter (if available).
-    Job Posting: {job_description_text}
+{format_field_list(section_fields)}
+    Job Posting Section: {section_text}
     """
 
-    response = llm.invoke(input=prompt)
-    response_content = response.content if hasattr(response, 'content') else str(response)
-    cleaned_response = response_content.strip("```").strip()
+    return invoke_json("job_details", prompt, expected_keys=section_fields)
+
+@cached_result("job_details", PROMPT_VERSION)
+def extract_job_details_from_text(job_description_text):
+    # Links, emails, salary, experience and deadline are taken from the text directly, the model only fills in the rest
+    pre_extracted = pre_extract_job_fields(job_description_text)
+    remaining_fields = {field: description for field, description in JOB_DETAIL_FIELDS.items() if field not in pre_extracted}
+
+    # Long postings are extracted per section, so an edited posting only re-extracts the sections that changed
+    job_details = extract_by_section(job_description_text, remaining_fields, JOB_SECTIONS, extract_job_section)
+    if job_details is None:
+        job_details = extract_by_chunks(job_description_text, remaining_fields, extract_job_section)
+    if job_details is None:
+        prompt = f"""
+        Extract the following details from the job posting in JSON format only. 
+        Do not include any extra text, explanations, or formatting outside of the JSON:
+{format_field_list(remaining_fields)}
+        Job Posting: {job_description_text}
+        """
 
-    if cleaned_response.startswith('json\n'):
-        cleaned_response = cleaned_response[5:].strip()
+        job_details = invoke_json(
+            "job_details", prompt, expected_keys=remaining_fields,
+            required_keys=[field for field in JOB_REQUIRED_FIELDS if field in remaining_fields],
+        )
+    if "error" in job_details:
+        return job_details
 
-    try:
-        job_details = json.loads(cleaned_response)
-    except json.JSONDecodeError:
-        job_details = {"error": "Failed to parse the response into JSON", "response": cleaned_response}
-    
-    return job_details
+    return {field: pre_extracted[field] if field in pre_extracted else job_details.get(field) for field in JOB_DETAIL_FIELDS}
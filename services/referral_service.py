@@ -1,16 +1,18 @@
-import json
-from models.llm import llm
+from models.llm import get_llm
+from utils.template_fields import compact_json, project_details_for_template
 
-def generate_job_referral_dynamic(referral_template, resume_details, job_details):
-    prompt = f"""
+def build_job_referral_prompt(referral_template, resume_details, job_details):
+    resume_details, job_details = project_details_for_template(referral_template, resume_details, job_details)
+
+    return f"""
     Referral template: 
     {referral_template}
 
     Resume Details:
-    {json.dumps(resume_details, indent=4)}
+    {compact_json(resume_details)}
 
     Job Description Details:
-    {json.dumps(job_details, indent=4)}
+    {compact_json(job_details)}
 
     Instructions:
     Create a referral request message using the provided referral template, resume details, and job description. Follow these instructions strictly:
@@ -31,8 +33,17 @@ def generate_job_referral_dynamic(referral_template, resume_details, job_details
     - Output only the completed referral request message, adhering strictly to the provided template. Do not add any explanations, additional content, or modifications beyond the template structure.
     """
 
-    response = llm.invoke(input=prompt)
+def generate_job_referral_dynamic(referral_template, resume_details, job_details):
+    prompt = build_job_referral_prompt(referral_template, resume_details, job_details)
+
+    response = get_llm("referral").invoke(input=prompt)
     
     referral_content = response.content if hasattr(response, 'content') else str(response)
     
     return referral_content.strip()
+
+def stream_job_referral_dynamic(referral_template, resume_details, job_details):
+    prompt = build_job_referral_prompt(referral_template, resume_details, job_details)
+
+    for chunk in get_llm("referral").stream(input=prompt):
+        yield chunk.content if hasattr(chunk, 'content') else str(chunk)
@@ -1,42 +1,89 @@
-import json
-from models.llm import llm
+from utils.field_extractor import pre_extract_resume_fields
+from utils.result_cache import cached_result
+from utils.sectioned_extraction import HEADER_SECTION, extract_by_chunks, extract_by_section
+from utils.structured_output import format_field_list, invoke_json
 
-def extract_resume_details_from_text(resume_text):
+PROMPT_VERSION = "4"
+
+# A whole-resume answer without these is not accepted from the fast model
+RESUME_REQUIRED_FIELDS = ("applicant_name",)
+
+RESUME_DETAIL_FIELDS = {
+    "applicant_name": "The applicant's name, properly capitalized and formatted.",
+    "skills": "An array of unique skills.",
+    "keywords": "An array of important keywords.",
+    "latest_education": "The most recent education degree (e.g., Bachelor's, Master's, etc.).",
+    "latest_college_name": "The name of the college or university for the latest education.",
+    "current_company": "The name of the current company.",
+    "current_role": "The current job role.",
+    "contact_information": "An object containing phone number, email address, and LinkedIn (if available).",
+    "work_experience": "A list of previous job titles, companies, and durations.",
+    "certifications": "An array of certifications or additional training completed.",
+    "languages": "An array of languages spoken and proficiency levels.",
+    "achievements": "A list of notable professional or academic achievements.",
+    "projects": "A list of specific projects the applicant has worked on, including the scope and role.",
+    "location": "The current city or region of the applicant.",
+    "hobbies_interests": "An array of personal interests or hobbies.",
+    "volunteer_experience": "A list of volunteer work or community involvement.",
+    "references": "A list of references (if available).",
+    "social_media_profiles": "A list of links to professional social media profiles (e.g., LinkedIn, GitHub).",
+}
+
+# Resume section -> (headings that start it, fields extracted from it), in the order conflicting values are resolved
+RESUME_SECTIONS = {
+    HEADER_SECTION: ((), ["applicant_name", "contact_information", "location", "social_media_profiles", "current_role"]),
+    "experience": (
+        ("experience", "work experience", "professional experience", "employment", "employment history", "work history", "career history"),
+        ["work_experience", "current_company", "current_role", "skills", "keywords", "achievements"],
+    ),
+    "summary": (("summary", "profile", "professional summary", "about me", "objective", "career objective"), ["current_role", "keywords", "location"]),
+    "education": (("education", "academic background", "academics", "education and training"), ["latest_education", "latest_college_name"]),
+    "skills": (("skills", "technical skills", "core skills", "key skills", "core competencies", "technologies", "tools and technologies"), ["skills", "keywords"]),
+    "projects": (("projects", "personal projects", "key projects", "selected projects"), ["projects", "skills", "keywords"]),
+    "certifications": (("certifications", "certificates", "licenses and certifications", "courses", "training"), ["certifications"]),
+    "languages": (("languages",), ["languages"]),
+    "achievements": (("achievements", "awards", "honors", "honors and awards", "accomplishments"), ["achievements"]),
+    "volunteer": (("volunteer experience", "volunteering", "community involvement"), ["volunteer_experience"]),
+    "interests": (("interests", "hobbies", "hobbies and interests"), ["hobbies_interests"]),
+    "references": (("references",), ["references"]),
+}
+
+# Cached by section text, so after an edit only the sections that changed are extracted again
+@cached_result("resume_section", PROMPT_VERSION, service="resume_details")
+def extract_resume_section(section, section_text, fields):
+    section_fields = {field: RESUME_DETAIL_FIELDS[field] for field in fields}
     prompt = f"""
-    Extract the following details from the resume into a JSON object. The JSON should have the following keys:
-    - "applicant_name": The applicant's name, properly capitalized and formatted.
-    - "skills": An array of unique skills.
-    - "keywords": An array of important keywords.
-    - "latest_education": The most recent education degree (e.g., Bachelor's, Master's, etc.).
-    - "latest_college_name": The name of the college or university for the latest education.
-    - "current_company": The name of the current company.
-    - "current_role": The current job role.
-    - "contact_information": An object containing phone number, email address, and LinkedIn (if available).
-    - "work_experience": A list of previous job titles, companies, and durations.
-    - "certifications": An array of certifications or additional training completed.
-    - "languages": An array of languages spoken and proficiency levels.
-    - "achievements": A list of notable professional or academic achievements.
-    - "projects": A list of specific projects the applicant has worked on, including the scope and role.
-    - "location": The current city or region of the applicant.
-    - "hobbies_interests": An array of personal interests or hobbies.
-    - "volunteer_experience": A list of volunteer work or community involvement.
-    - "references": A list of references (if available).
-    - "social_media_profiles": A list of links to professional social media profiles (e.g., LinkedIn, GitHub).
-    Resume Text: {resume_text}
+    Extract the following details from the resume section "{section}" into a JSON object. Use null or an empty array for details this section does not mention. The JSON should have the following keys:
+{format_field_list(section_fields)}
+    Resume Section: {section_text}
 
     Output only the JSON data. Do not include any extra text, explanation, or formatting.
     """
 
-    response = llm.invoke(input=prompt)
-    response_content = response.content if hasattr(response, 'content') else str(response)
-    cleaned_response = response_content.strip("```").strip()
+    return invoke_json("resume_details", prompt, expected_keys=section_fields)
+
+@cached_result("resume_details", PROMPT_VERSION)
+def extract_resume_details_from_text(resume_text):
+    pre_extracted = pre_extract_resume_fields(resume_text)
+    remaining_fields = {field: description for field, description in RESUME_DETAIL_FIELDS.items() if field not in pre_extracted}
+
+    details = extract_by_section(resume_text, remaining_fields, RESUME_SECTIONS, extract_resume_section)
+    if details is None:
+        details = extract_by_chunks(resume_text, remaining_fields, extract_resume_section)
+    if details is None:
+        prompt = f"""
+        Extract the following details from the resume into a JSON object. The JSON should have the following keys:
+{format_field_list(remaining_fields)}
+        Resume Text: {resume_text}
+
+        Output only the JSON data. Do not include any extra text, explanation, or formatting.
+        """
 
-    if cleaned_response.startswith('json\n'):
-        cleaned_response = cleaned_response[5:].strip()
+        details = invoke_json(
+            "resume_details", prompt, expected_keys=remaining_fields,
+            required_keys=[field for field in RESUME_REQUIRED_FIELDS if field in remaining_fields],
+        )
+    if "error" in details:
+        return details
 
-    try:
-        details = json.loads(cleaned_response)
-    except json.JSONDecodeError:
-        details = {"error": "Failed to parse the response into JSON", "response": cleaned_response}
-    
-    return details
+    return {field: pre_extracted[field] if field in pre_extracted else details.get(field) for field in RESUME_DETAIL_FIELDS}
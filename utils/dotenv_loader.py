@@ -1,8 +1,20 @@
-import os
+import threading
 from dotenv import load_dotenv
 
+_lock = threading.Lock()
+_loaded = False
+
+# Load .env once per process, later calls are free. Variables already set in the environment win over the file.
 def load_environment_variables():
-    load_dotenv()
+    global _loaded
+    if _loaded:
+        return
+
+    with _lock:
+        if not _loaded:
+            load_dotenv(".env")
+            _loaded = True
 
-# Call this function in the entry point of your app to load variables
+# Loaded on import, because most settings are read with os.getenv when their module is imported.
+# Entry points import this module before anything that reads settings.
 load_environment_variables()
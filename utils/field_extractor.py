@@ -0,0 +1,210 @@
+import re
+from urllib.parse import urlparse
+
+# Fields that can be read straight off the text with patterns, so the LLM neither has to generate them nor can invent them
+
+_EMAIL = re.compile(r"\b[A-Za-z0-9._%+-]+@[A-Za-z0-9.-]+\.[A-Za-z]{2,}\b")
+_URL = re.compile(r"\b(?:https?://|www\.)[^\s<>\"'()\[\]]+", re.IGNORECASE)
+_PHONE = re.compile(r"(?<![\w+])\+?\(?\d{1,4}\)?(?:[\s.-]?\(?\d{2,5}\)?){2,5}(?!\w)")
+
+# Currency codes must stand on their own, otherwise the "rs" of "hours" or "partners" reads as rupees
+_CURRENCY = r"(?:[$€£₹¥]|(?<![A-Za-z])(?:USD|EUR|GBP|INR|CAD|AUD|CHF|Rs\.?)(?![A-Za-z]))"
+_AMOUNT = r"\d{1,3}(?:[,.\s]\d{3})*(?:\.\d+)?\s*(?:[kKmM]\b|LPA\b|lakhs?\b|lacs?\b)?"
+_SALARY = re.compile(
+    rf"{_CURRENCY}\s?{_AMOUNT}(?:\s*(?:-|–|—|to)\s*{_CURRENCY}?\s?{_AMOUNT})?(?:\s*{_CURRENCY})?(?:\s*(?:per|/|a)\s*(?:year|annum|month|hour|yr|hr|mo)\b)?"
+    rf"|{_AMOUNT}(?:\s*(?:-|–|—|to)\s*{_AMOUNT})?\s*{_CURRENCY}(?:\s*(?:per|/|a)\s*(?:year|annum|month|hour|yr|hr|mo)\b)?",
+    re.IGNORECASE,
+)
+# An amount is only taken for salary when it is close to a salary word or states a pay period,
+# so funding rounds and revenue figures ("raised $40M") are left to the model
+_SALARY_CONTEXT = re.compile(r"salary|compensation|pay|ctc|stipend|remuneration|package", re.IGNORECASE)
+_PAY_PERIOD = re.compile(r"(?:per|/|a)\s*(?:year|annum|month|hour|yr|hr|mo)\b", re.IGNORECASE)
+_UNLABELLED_SALARY = re.compile(r"\d{1,3}(?:[,.]\d{3})*\s*(?:[kK]|LPA|lakhs?|lacs?)\b(?:\s*(?:-|–|—|to)\s*\d{1,3}(?:[,.]\d{3})*\s*(?:[kK]|LPA|lakhs?|lacs?)\b)?", re.IGNORECASE)
+
+_YEARS_OF_EXPERIENCE = re.compile(
+    r"(?:(?:at\s+least|minimum(?:\s+of)?|min\.?|over|more\s+than)\s+)?"
+    r"\d{1,2}(?:\.\d)?\s*(?:\+|plus)?\s*(?:(?:-|–|to)\s*\d{1,2}\s*\+?\s*)?(?:years?|yrs?)\b"
+    r"(?=[^.\n]{0,40}?\bexperience\b)",
+    re.IGNORECASE,
+)
+# A years figure is only a requirement when requirement wording is close by, or it sits under a requirements heading;
+# "Acme has 25 years of experience" describes the company
+_REQUIREMENT_CONTEXT = re.compile(
+    r"requir|minimum|at\s+least|you\s+(?:have|bring|need|will\s+need)|you'll\s+(?:have|need|bring)|must\s+have|should\s+have|ideal\s+candidate|looking\s+for",
+    re.IGNORECASE,
+)
+_REQUIREMENTS_HEADING = re.compile(
+    r"^[ \t#*_]*(?:requirements|qualifications|must[\s-]haves?|what\s+you(?:'ll)?\s+(?:need|bring)|who\s+you\s+are|skills\s+and\s+experience)\b",
+    re.IGNORECASE | re.MULTILINE,
+)
+_SECTION_BREAK = re.compile(r"\n\s*\n")
+
+_MONTHS = r"(?:jan(?:uary)?|feb(?:ruary)?|mar(?:ch)?|apr(?:il)?|may|jun(?:e)?|jul(?:y)?|aug(?:ust)?|sep(?:t(?:ember)?)?|oct(?:ober)?|nov(?:ember)?|dec(?:ember)?)"
+_DATE = (
+    rf"\d{{4}}-\d{{2}}-\d{{2}}"
+    rf"|\d{{1,2}}[/.-]\d{{1,2}}[/.-]\d{{2,4}}"
+    rf"|\d{{1,2}}(?:st|nd|rd|th)?\s+{_MONTHS}\.?,?\s+\d{{4}}"
+    rf"|{_MONTHS}\.?\s+\d{{1,2}}(?:st|nd|rd|th)?,?\s+\d{{4}}"
+)
+_DEADLINE = re.compile(
+    rf"(?:deadline|apply\s+(?:by|before|until)|applications?\s+(?:close|closes|closing|due)(?:\s+on)?|closing\s+date|last\s+date(?:\s+to\s+apply)?)"
+    rf"\s*(?:is|on|:|-)?\s*({_DATE})",
+    re.IGNORECASE,
+)
+
+_APPLY_CONTEXT = re.compile(r"apply|application", re.IGNORECASE)
+# Without "apply" next to it, a URL is an apply link only on an applicant tracking system or under a careers-style path segment
+_APPLY_HOST = re.compile(r"greenhouse\.io|lever\.co|workday|smartrecruiters\.com|ashbyhq\.com|workable\.com|recruitee\.com", re.IGNORECASE)
+_APPLY_SEGMENTS = {"apply", "careers", "career", "jobs", "job", "positions", "position", "openings", "vacancies", "join-us"}
+
+# Hosts that are never the company's own website
+_THIRD_PARTY_HOSTS = (
+    "linkedin.com", "github.com", "gitlab.com", "twitter.com", "x.com", "facebook.com", "instagram.com", "youtube.com",
+    "glassdoor.", "indeed.", "greenhouse.io", "lever.co", "workday", "myworkdayjobs.com", "smartrecruiters.com",
+    "ashbyhq.com", "angel.co", "wellfound.com", "naukri.com", "monster.", "bit.ly",
+)
+
+# Host -> profile label used in the resume's contact information
+_PROFILE_HOSTS = {
+    "linkedin.com": "linkedin",
+    "github.com": "github",
+    "gitlab.com": "gitlab",
+    "twitter.com": "twitter",
+    "x.com": "twitter",
+    "stackoverflow.com": "stackoverflow",
+    "medium.com": "medium",
+    "kaggle.com": "kaggle",
+    "behance.net": "behance",
+    "dribbble.com": "dribbble",
+}
+# Profile links are often written without a scheme, e.g. "linkedin.com/in/jane"
+_PROFILE_URL = re.compile(
+    r"\b(?:https?://)?(?:www\.)?(?:" + "|".join(re.escape(host) for host in _PROFILE_HOSTS) + r")/[^\s<>\"'()\[\],;|]+",
+    re.IGNORECASE,
+)
+
+def _clean_url(url):
+    url = url.rstrip(".,;:!?")
+    if not url.lower().startswith("http"):
+        url = "https://" + url
+    return url
+
+def _host(url):
+    host = urlparse(url).netloc.lower()
+    return host[4:] if host.startswith("www.") else host
+
+def _is_third_party(host):
+    return any(host == marker or host.endswith("." + marker) or marker.endswith(".") and marker in host for marker in _THIRD_PARTY_HOSTS)
+
+def find_emails(text):
+    return list(dict.fromkeys(match.group(0).rstrip(".") for match in _EMAIL.finditer(text)))
+
+def find_phone_numbers(text):
+    numbers = []
+    for match in _PHONE.finditer(text):
+        number = match.group(0).strip()
+        digits = re.sub(r"\D", "", number)
+        # Years ("2019 - 2023") and dates look like numbers too, a phone number has at least 8 digits
+        if 8 <= len(digits) <= 15 and not re.fullmatch(r"(?:19|20)\d{2}\D+(?:19|20)\d{2}", number):
+            numbers.append(number)
+    return list(dict.fromkeys(numbers))
+
+def find_profile_links(text):
+    profiles = {}
+    for match in _PROFILE_URL.finditer(text):
+        url = _clean_url(match.group(0))
+        host = _host(url)
+        label = next(label for profile_host, label in _PROFILE_HOSTS.items() if host == profile_host or host.endswith("." + profile_host))
+        profiles.setdefault(label, url)
+    return profiles
+
+def _has_salary_context(text, match):
+    return bool(_SALARY_CONTEXT.search(text[max(0, match.start() - 60):match.start()]))
+
+def find_salary_range(text):
+    for match in _SALARY.finditer(text):
+        if _has_salary_context(text, match) or _PAY_PERIOD.search(match.group(0)):
+            return match.group(0).strip()
+    for match in _UNLABELLED_SALARY.finditer(text):
+        if _has_salary_context(text, match):
+            return match.group(0).strip()
+    return None
+
+def _under_requirements_heading(text, position):
+    headings = list(_REQUIREMENTS_HEADING.finditer(text, 0, position))
+    # The heading's section must still be running, i.e. no blank line between it and the match
+    return bool(headings) and not _SECTION_BREAK.search(text, headings[-1].end(), position)
+
+# With `required` only figures stated as a requirement count (job postings), otherwise the first one (resumes)
+def find_years_of_experience(text, required=True):
+    for match in _YEARS_OF_EXPERIENCE.finditer(text):
+        if not required or _REQUIREMENT_CONTEXT.search(text[max(0, match.start() - 60):match.end()]) or _under_requirements_heading(text, match.start()):
+            return " ".join(match.group(0).split())
+    return None
+
+def _is_apply_url(url):
+    segments = {segment.lower() for segment in urlparse(url).path.split("/") if segment}
+    return bool(_APPLY_HOST.search(_host(url)) or segments & _APPLY_SEGMENTS)
+
+def find_application_deadline(text):
+    match = _DEADLINE.search(text)
+    return match.group(1).strip() if match else None
+
+# Apply link: a URL right after "apply", or one that looks like a job posting; company website: a plain first-party homepage
+def find_job_links(text):
+    apply_link = None
+    company_website = None
+    urls = []
+    for match in _URL.finditer(text):
+        url = _clean_url(match.group(0))
+        urls.append(url)
+        if apply_link is None and _APPLY_CONTEXT.search(text[max(0, match.start() - 40):match.start()]):
+            apply_link = url
+
+    if apply_link is None:
+        apply_link = next((url for url in urls if _is_apply_url(url)), None)
+
+    for url in urls:
+        host = _host(url)
+        if url != apply_link and not _is_third_party(host) and urlparse(url).path.strip("/") == "":
+            company_website = url
+            break
+
+    return apply_link, company_website
+
+# Job detail fields recovered locally; only the fields that were found are returned
+def pre_extract_job_fields(text):
+    fields = {}
+    emails = find_emails(text)
+    apply_link, company_website = find_job_links(text)
+
+    found = {
+        "contact_email": emails[0] if emails else None,
+        "apply_link": apply_link,
+        "company_website": company_website,
+        "salary_range": find_salary_range(text),
+        "years_of_experience_required": find_years_of_experience(text),
+        "application_deadline": find_application_deadline(text),
+    }
+    for field, value in found.items():
+        if value:
+            fields[field] = value
+    return fields
+
+# Resume detail fields recovered locally; only the fields that were found are returned
+def pre_extract_resume_fields(text):
+    fields = {}
+    emails = find_emails(text)
+    phone_numbers = find_phone_numbers(text)
+    profiles = find_profile_links(text)
+
+    # Only a complete contact block is filled in here, a partial one would hide the missing parts from the model
+    if emails and phone_numbers and "linkedin" in profiles:
+        fields["contact_information"] = {
+            "phone": phone_numbers[0],
+            "email": emails[0],
+            "linkedin": profiles["linkedin"],
+        }
+    if profiles:
+        fields["social_media_profiles"] = list(profiles.values())
+    return fields
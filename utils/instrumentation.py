@@ -0,0 +1,245 @@
+import atexit
+import contextvars
+import json
+import logging
+import os
+import tempfile
+import threading
+import time
+import uuid
+from collections import defaultdict
+
+logger = logging.getLogger("arbeit.llm")
+
+# Prometheus text-format file refreshed after LLM calls (for a node-exporter textfile collector or any file scraper)
+METRICS_PATH = os.getenv("LLM_METRICS_PATH", "")
+METRICS_WRITE_INTERVAL = float(os.getenv("LLM_METRICS_WRITE_INTERVAL", "1"))
+
+_current_run = contextvars.ContextVar("current_run", default=None)
+_queued_since = contextvars.ContextVar("queued_since", default=None)
+_cache_status = contextvars.ContextVar("cache_status", default=None)
+_last_record = contextvars.ContextVar("last_record", default=None)
+_scheduler_wait = contextvars.ContextVar("scheduler_wait", default=None)
+
+# A group of LLM calls belonging to one user action (a Process click, a batch posting, ...)
+class Run:
+    def __init__(self):
+        self.run_id = uuid.uuid4().hex[:12]
+        self.started_at = time.perf_counter()
+        self.records = []
+        self._lock = threading.Lock()
+
+    def add(self, record):
+        with self._lock:
+            self.records.append(record)
+
+    # Records with start/end offsets in seconds from the start of the run, ready to be drawn as a waterfall
+    def timeline(self):
+        with self._lock:
+            records = list(self.records)
+        return [
+            dict(record, start=round(record["started_at"] - self.started_at, 3), end=round(record["started_at"] - self.started_at + record["wall_time"], 3))
+            for record in sorted(records, key=lambda record: record["started_at"])
+        ]
+
+def start_run():
+    run = Run()
+    _current_run.set(run)
+    return run
+
+def current_run():
+    return _current_run.get()
+
+# Submit work to an executor so it keeps the caller's run context, recording when it was queued
+def submit_with_context(executor, fn, *args, **kwargs):
+    context = contextvars.copy_context()
+    queued_at = time.perf_counter()
+
+    def run_queued():
+        _queued_since.set(queued_at)
+        return fn(*args, **kwargs)
+
+    return executor.submit(context.run, run_queued)
+
+class _Metrics:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._stages = defaultdict(lambda: defaultdict(float))
+        self._write_lock = threading.Lock()
+        self._last_written = 0.0
+
+    def observe(self, record):
+        with self._lock:
+            stage = self._stages[record["stage"]]
+            if record["kind"] == "cache":
+                stage["cache_hits_total" if record["cache_hit"] else "cache_misses_total"] += 1
+                return
+            stage["calls_total"] += 1
+            stage["seconds_sum"] += record["wall_time"]
+            stage["seconds_max"] = max(stage["seconds_max"], record["wall_time"])
+            stage["queue_seconds_sum"] += record["queue_time"]
+            stage["prompt_tokens_total"] += record["prompt_tokens"] or 0
+            stage["completion_tokens_total"] += record["completion_tokens"] or 0
+            if record["error"]:
+                stage["errors_total"] += 1
+
+    def increment(self, stage, metric):
+        with self._lock:
+            self._stages[stage][metric] += 1
+
+    def render(self):
+        with self._lock:
+            stages = {name: dict(values) for name, values in self._stages.items()}
+
+        lines = []
+        for metric in ("calls_total", "errors_total", "parse_failures_total", "cache_hits_total", "cache_misses_total", "coalesced_total",
+                       "retries_total", "rate_limited_total", "overloaded_total", "escalations_total",
+                       "prompt_tokens_total", "completion_tokens_total", "seconds_sum", "seconds_max", "queue_seconds_sum"):
+            lines.append(f"# TYPE arbeit_llm_{metric} {'gauge' if metric == 'seconds_max' else 'counter'}")
+            for name, values in sorted(stages.items()):
+                lines.append(f'arbeit_llm_{metric}{{stage="{name}"}} {values.get(metric, 0):g}')
+        return "\n".join(lines) + "\n"
+
+    def write(self, path, force=False):
+        with self._write_lock:
+            now = time.monotonic()
+            if not force and now - self._last_written < METRICS_WRITE_INTERVAL:
+                return
+            self._last_written = now
+            # Write to a temporary file of our own and rename it, so a scraper never reads a half-written file
+            # and another process writing the same metrics file never shares the temporary file
+            with tempfile.NamedTemporaryFile("w", encoding="utf-8", dir=os.path.dirname(path) or ".", prefix=".metrics-", delete=False) as file:
+                file.write(self.render())
+            try:
+                os.replace(file.name, path)
+            except OSError:
+                os.unlink(file.name)
+                raise
+
+metrics = _Metrics()
+
+if METRICS_PATH:
+    # Throttled writes can leave the last few calls out of the file, flush them on exit
+    atexit.register(lambda: metrics.write(METRICS_PATH, force=True))
+
+def render_prometheus_metrics():
+    return metrics.render()
+
+def _emit(record):
+    run = _current_run.get()
+    if run is not None:
+        record["run_id"] = run.run_id
+        run.add(record)
+    metrics.observe(record)
+    logger.info(json.dumps(record, default=str))
+    if METRICS_PATH:
+        try:
+            metrics.write(METRICS_PATH)
+        except OSError:
+            logger.exception("Could not write LLM metrics to %s", METRICS_PATH)
+
+def _usage(message):
+    usage = getattr(message, "usage_metadata", None) or {}
+    if usage:
+        return usage.get("input_tokens"), usage.get("output_tokens")
+    token_usage = (getattr(message, "response_metadata", None) or {}).get("token_usage") or {}
+    return token_usage.get("prompt_tokens"), token_usage.get("completion_tokens")
+
+# Called by the scheduler with the time a model call waited for its turn, picked up by the call's record
+def record_scheduler_wait(seconds):
+    _scheduler_wait.set(seconds)
+
+def _new_record(stage, kind):
+    started_at = time.perf_counter()
+    queued_since = _queued_since.get() if kind == "llm" else None
+    # Only the first model call of a queued task waited in the queue
+    if queued_since is not None:
+        _queued_since.set(None)
+    scheduler_wait = _scheduler_wait.get() if kind == "llm" else None
+    if scheduler_wait is not None:
+        _scheduler_wait.set(None)
+    return {
+        "kind": kind,
+        "stage": stage,
+        "run_id": None,
+        "started_at": started_at,
+        "wall_time": 0.0,
+        # The time since a task was queued already covers its first call's wait for the scheduler
+        "queue_time": round(started_at - queued_since, 4) if queued_since else round(scheduler_wait or 0.0, 4),
+        "scheduler_wait": round(scheduler_wait or 0.0, 4),
+        "prompt_tokens": None,
+        "completion_tokens": None,
+        "parse_success": None,
+        "cache_hit": None if _cache_status.get() is None else False,
+        "error": None,
+    }
+
+# Record the outcome of parsing the most recent LLM call made in this context
+def record_parse_result(success):
+    record = _last_record.get()
+    if record is not None:
+        record["parse_success"] = success
+        logger.info(json.dumps({"kind": "parse", "stage": record["stage"], "run_id": record["run_id"], "parse_success": success}))
+        if not success:
+            metrics.increment(record["stage"], "parse_failures_total")
+
+def record_cache_lookup(stage, hit):
+    record = _new_record(stage, "cache")
+    record["cache_hit"] = hit
+    _emit(record)
+
+# Mark LLM calls made while running `fn` as cache misses of `stage`
+def run_as_cache_miss(fn, *args, **kwargs):
+    token = _cache_status.set("miss")
+    try:
+        return fn(*args, **kwargs)
+    finally:
+        _cache_status.reset(token)
+
+# Chat model wrapper that records every invoke/stream call made through it
+class InstrumentedLLM:
+    def __init__(self, llm, stage):
+        self.llm = llm
+        self.stage = stage
+
+    def bind(self, **kwargs):
+        return InstrumentedLLM(self.llm.bind(**kwargs), self.stage)
+
+    def invoke(self, *args, **kwargs):
+        record = _new_record(self.stage, "llm")
+        _last_record.set(record)
+        try:
+            response = self.llm.invoke(*args, **kwargs)
+            record["prompt_tokens"], record["completion_tokens"] = _usage(response)
+            return response
+        except Exception as error:
+            record["error"] = f"{type(error).__name__}: {error}"
+            raise
+        finally:
+            record["wall_time"] = round(time.perf_counter() - record["started_at"], 4)
+            _emit(record)
+
+    def stream(self, *args, **kwargs):
+        record = _new_record(self.stage, "llm")
+        first_token_at = None
+        try:
+            for chunk in self.llm.stream(*args, **kwargs):
+                if first_token_at is None:
+                    first_token_at = time.perf_counter()
+                prompt_tokens, completion_tokens = _usage(chunk)
+                if prompt_tokens is not None:
+                    record["prompt_tokens"] = (record["prompt_tokens"] or 0) + prompt_tokens
+                if completion_tokens is not None:
+                    record["completion_tokens"] = (record["completion_tokens"] or 0) + completion_tokens
+                yield chunk
+        except Exception as error:
+            record["error"] = f"{type(error).__name__}: {error}"
+            raise
+        finally:
+            record["wall_time"] = round(time.perf_counter() - record["started_at"], 4)
+            if first_token_at is not None:
+                record["time_to_first_token"] = round(first_token_at - record["started_at"], 4)
+            _emit(record)
+
+    def __getattr__(self, name):
+        return getattr(self.llm, name)
@@ -0,0 +1,206 @@
+import datetime
+import json
+import heapq
+import math
+import os
+import re
+import sqlite3
+import threading
+from collections import defaultdict
+from utils.field_extractor import find_years_of_experience
+from utils.skill_matcher import canonicalize, normalize_term
+
+INDEX_PATH = os.getenv("JOB_INDEX_PATH", ".cache/job_index.sqlite3")
+
+# How much a match in each field counts compared to a keyword match
+FIELD_WEIGHTS = {"skills": 2.0, "keywords": 1.0, "role": 1.5, "job_location": 0.5}
+
+# BM25 parameters
+K1 = 1.2
+B = 0.75
+
+# Score multiplier for postings that ask for more years of experience than the candidate has
+MISSING_EXPERIENCE_PENALTY = 0.5
+
+_ROLE_STOPWORDS = {"a", "an", "and", "for", "of", "the", "to", "in", "at", "with", "-", "/", "&"}
+_YEARS = re.compile(r"(\d+(?:\.\d+)?)")
+_CALENDAR_YEAR = re.compile(r"\b(19[5-9]\d|20\d{2})\b")
+_ONGOING = re.compile(r"present|current|now|till date|to date|today", re.IGNORECASE)
+
+def _terms(value):
+    if not value:
+        return []
+    if isinstance(value, str):
+        return [part for part in re.split(r"[,;\n]", value) if part.strip()]
+    return [str(item) for item in value if item]
+
+def _words(value):
+    return [word for word in normalize_term(value or "").split() if word not in _ROLE_STOPWORDS]
+
+# Weighted index terms of an extracted posting or resume, prefixed by field so "role:engineer" and "skills:python" stay apart
+def index_terms(details, role_field="role", location_field="job_location"):
+    weights = defaultdict(float)
+    for skill in _terms(details.get("skills")):
+        weights[f"skill:{canonicalize(skill)}"] += FIELD_WEIGHTS["skills"]
+    for keyword in _terms(details.get("keywords")):
+        # Keywords and skills overlap a lot between postings and resumes, so both live in the same term space
+        weights[f"skill:{canonicalize(keyword)}"] += FIELD_WEIGHTS["keywords"]
+    for word in _words(details.get(role_field) if isinstance(details.get(role_field), str) else ""):
+        weights[f"role:{word}"] += FIELD_WEIGHTS["role"]
+    for word in _words(details.get(location_field) if isinstance(details.get(location_field), str) else ""):
+        weights[f"location:{word}"] += FIELD_WEIGHTS["job_location"]
+    weights.pop("skill:", None)
+    return dict(weights)
+
+def parse_years(value):
+    match = _YEARS.search(str(value or ""))
+    return float(match.group(1)) if match else None
+
+# Years of experience of a candidate: what the resume states ("8+ years of experience"), otherwise the span of the
+# calendar years in the extracted work history, up to today when a role is ongoing. None when neither is there.
+def candidate_years(resume_text, resume_details):
+    stated = parse_years(find_years_of_experience(resume_text or "", required=False))
+    if stated is not None:
+        return stated
+
+    years, ongoing = [], False
+    for entry in resume_details.get("work_experience") or []:
+        entry = entry if isinstance(entry, str) else json.dumps(entry, ensure_ascii=False)
+        years += [int(year) for year in _CALENDAR_YEAR.findall(entry)]
+        ongoing = ongoing or bool(_ONGOING.search(entry))
+    if not years:
+        return None
+    end = datetime.date.today().year if ongoing else max(years)
+    return float(max(0, end - min(years)))
+
+# Persistent inverted index over extracted job details, scored with BM25.
+# Postings can be added and removed one at a time; the statistics BM25 needs are kept up to date incrementally.
+class JobIndex:
+    def __init__(self, path=INDEX_PATH):
+        self.path = path
+        self._lock = threading.RLock()
+        self._postings = defaultdict(dict)
+        self._documents = {}
+        self._total_length = 0.0
+        # Per term {posting_id: BM25 term weight}, computed lazily on search and dropped whenever the corpus changes
+        self._impacts = {}
+        self._connection = None
+        self._load()
+
+    def _connect(self):
+        if self._connection is None and self.path:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            self._connection = sqlite3.connect(self.path, check_same_thread=False)
+            self._connection.execute("CREATE TABLE IF NOT EXISTS postings (id TEXT PRIMARY KEY, details TEXT NOT NULL)")
+            self._connection.commit()
+        return self._connection
+
+    def _load(self):
+        connection = self._connect()
+        if connection is None:
+            return
+        for posting_id, details in connection.execute("SELECT id, details FROM postings"):
+            self._add_to_memory(posting_id, json.loads(details))
+
+    def _add_to_memory(self, posting_id, job_details):
+        terms = index_terms(job_details)
+        length = sum(terms.values())
+        self._documents[posting_id] = {
+            "details": job_details,
+            "terms": terms,
+            "length": length,
+            "required_years": parse_years(job_details.get("years_of_experience_required")),
+        }
+        self._total_length += length
+        self._impacts = {}
+        for term, weight in terms.items():
+            self._postings[term][posting_id] = weight
+
+    def _remove_from_memory(self, posting_id):
+        document = self._documents.pop(posting_id, None)
+        if document is None:
+            return False
+        self._total_length -= document["length"]
+        self._impacts = {}
+        for term in document["terms"]:
+            postings = self._postings.get(term)
+            if postings is not None:
+                postings.pop(posting_id, None)
+                if not postings:
+                    del self._postings[term]
+        return True
+
+    def __len__(self):
+        return len(self._documents)
+
+    def __contains__(self, posting_id):
+        return posting_id in self._documents
+
+    def add(self, posting_id, job_details):
+        self.add_many([(posting_id, job_details)])
+
+    # Adding (or replacing) many postings at once writes them in a single transaction
+    def add_many(self, postings):
+        rows = []
+        with self._lock:
+            for posting_id, job_details in postings:
+                posting_id = str(posting_id)
+                self._remove_from_memory(posting_id)
+                self._add_to_memory(posting_id, job_details)
+                rows.append((posting_id, json.dumps(job_details, ensure_ascii=False)))
+            connection = self._connect()
+            if connection is not None and rows:
+                connection.executemany("INSERT OR REPLACE INTO postings (id, details) VALUES (?, ?)", rows)
+                connection.commit()
+
+    def remove(self, posting_id):
+        posting_id = str(posting_id)
+        with self._lock:
+            removed = self._remove_from_memory(posting_id)
+            connection = self._connect()
+            if removed and connection is not None:
+                connection.execute("DELETE FROM postings WHERE id = ?", (posting_id,))
+                connection.commit()
+            return removed
+
+    def get(self, posting_id):
+        document = self._documents.get(str(posting_id))
+        return document["details"] if document else None
+
+    def _term_impacts(self, term, document_count):
+        impacts = self._impacts.get(term)
+        if impacts is None:
+            postings = self._postings.get(term, {})
+            average_length = self._total_length / document_count or 1.0
+            idf = math.log(1 + (document_count - len(postings) + 0.5) / (len(postings) + 0.5))
+            impacts = self._impacts[term] = {
+                posting_id: idf * term_frequency * (K1 + 1) / (term_frequency + K1 * (1 - B + B * self._documents[posting_id]["length"] / average_length))
+                for posting_id, term_frequency in postings.items()
+            }
+        return impacts
+
+    # Top-k postings for an extracted resume as [(posting_id, score, job_details)], best first.
+    # Only the postings lists of the resume's terms are visited, so the cost grows with the matches, not the corpus.
+    def search(self, resume_details, top_k=10, candidate_years=None):
+        query = index_terms(resume_details, role_field="current_role", location_field="location")
+
+        with self._lock:
+            document_count = len(self._documents)
+            if not document_count or not query:
+                return []
+            scores = defaultdict(float)
+            for term, query_weight in query.items():
+                impacts = self._term_impacts(term, document_count)
+                for posting_id, impact in impacts.items():
+                    scores[posting_id] += query_weight * impact
+
+            if candidate_years is not None:
+                for posting_id in scores:
+                    required_years = self._documents[posting_id]["required_years"]
+                    if required_years is not None and required_years > candidate_years:
+                        scores[posting_id] *= MISSING_EXPERIENCE_PENALTY
+
+            ranked = heapq.nlargest(top_k, scores.items(), key=lambda item: item[1])
+            return [(posting_id, round(score, 4), self._documents[posting_id]["details"]) for posting_id, score in ranked]
@@ -0,0 +1,345 @@
+import contextlib
+import contextvars
+import heapq
+import itertools
+import logging
+import os
+import random
+import re
+import threading
+import time
+from utils.instrumentation import metrics, record_scheduler_wait
+
+logger = logging.getLogger("arbeit.llm")
+
+# Priority classes, lower runs first
+INTERACTIVE = 0
+GENERATION = 1
+BATCH = 2
+
+SERVICE_PRIORITIES = {
+    "job_details": INTERACTIVE,
+    "resume_details": INTERACTIVE,
+    "comparison": INTERACTIVE,
+    "cover_letter": GENERATION,
+    "referral": GENERATION,
+    "connection_note": GENERATION,
+    "combined_generation": GENERATION,
+}
+
+# Starting request rate, replaced by the provider's own limit once its rate-limit headers have been seen
+REQUESTS_PER_SECOND = float(os.getenv("LLM_REQUESTS_PER_SECOND", "10"))
+BURST = float(os.getenv("LLM_BURST", os.getenv("LLM_REQUESTS_PER_SECOND", "10")))
+# Period the provider's x-ratelimit-limit header counts requests over
+RATE_LIMIT_WINDOW_SECONDS = float(os.getenv("LLM_RATE_LIMIT_WINDOW_SECONDS", "1"))
+
+# Concurrent requests start at the initial limit, grow by one per round of successes and halve on overload
+INITIAL_CONCURRENCY = float(os.getenv("LLM_INITIAL_CONCURRENCY", "4"))
+MAX_CONCURRENCY = float(os.getenv("LLM_MAX_CONCURRENCY", "16"))
+DECREASE_COOLDOWN_SECONDS = 1.0
+
+RETRY_BASE_SECONDS = float(os.getenv("LLM_RETRY_BASE_SECONDS", "0.5"))
+RETRY_MAX_SECONDS = float(os.getenv("LLM_RETRY_MAX_SECONDS", "20"))
+RETRYABLE_STATUS_CODES = {408, 409, 425, 429, 500, 502, 503, 504, 529}
+OVERLOAD_STATUS_CODES = {429, 503, 529}
+
+class DeadlineExceeded(TimeoutError):
+    pass
+
+_priority = contextvars.ContextVar("llm_priority", default=None)
+_deadline = contextvars.ContextVar("llm_deadline", default=None)
+
+# Run the block with a priority class for its model calls and/or a time budget in seconds.
+# Both are inherited by work submitted with submit_with_context; a nested budget can only shorten the outer one.
+@contextlib.contextmanager
+def scheduling(priority=None, timeout=None):
+    tokens = []
+    if priority is not None:
+        tokens.append((_priority, _priority.set(priority)))
+    if timeout is not None:
+        deadline = time.monotonic() + timeout
+        current = _deadline.get()
+        tokens.append((_deadline, _deadline.set(deadline if current is None else min(current, deadline))))
+    try:
+        yield
+    finally:
+        for variable, token in reversed(tokens):
+            variable.reset(token)
+
+def _status_code(error):
+    for source in (error, getattr(error, "response", None)):
+        status_code = getattr(source, "status_code", None)
+        if isinstance(status_code, int):
+            return status_code
+    return None
+
+def _is_timeout(error):
+    return isinstance(error, (TimeoutError, ConnectionError)) or "Timeout" in type(error).__name__ or "Connection" in type(error).__name__
+
+def is_retryable(error):
+    if isinstance(error, DeadlineExceeded):
+        return False
+    status_code = _status_code(error)
+    if status_code is not None:
+        return status_code in RETRYABLE_STATUS_CODES
+    return _is_timeout(error)
+
+def _is_overload(error):
+    status_code = _status_code(error)
+    return status_code in OVERLOAD_STATUS_CODES if status_code is not None else _is_timeout(error)
+
+# Rate-limit headers of a response, a streamed chunk or an API error, with lower-case names
+def response_headers(source):
+    headers = getattr(getattr(source, "response", None), "headers", None) or getattr(source, "headers", None)
+    if not headers:
+        headers = (getattr(source, "response_metadata", None) or {}).get("headers")
+    try:
+        return {str(name).lower(): value for name, value in dict(headers or {}).items()}
+    except (TypeError, ValueError):
+        return {}
+
+_DURATION_PART = re.compile(r"(\d+(?:\.\d+)?)(ms|s|m|h)")
+_DURATION_UNITS = {"ms": 0.001, "s": 1, "m": 60, "h": 3600}
+
+# "2", "1.5", "20ms" or "6m0s" -> seconds
+def parse_seconds(value):
+    if value is None:
+        return None
+    value = str(value).strip()
+    try:
+        return float(value)
+    except ValueError:
+        parts = _DURATION_PART.findall(value)
+        return sum(float(number) * _DURATION_UNITS[unit] for number, unit in parts) if parts else None
+
+def _number(value):
+    try:
+        return float(value) if value is not None else None
+    except ValueError:
+        return None
+
+def _header(headers, *names):
+    for name in names:
+        if name in headers:
+            return headers[name]
+    return None
+
+class TokenBucket:
+    def __init__(self, rate, burst):
+        self.rate = rate
+        self.capacity = max(1.0, burst)
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self.paused_until = 0.0
+
+    def _refill(self, now):
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    # Seconds until a request may be sent
+    def delay(self, now):
+        if now < self.paused_until:
+            return self.paused_until - now
+        self._refill(now)
+        if self.tokens >= 1:
+            return 0.0
+        return (1 - self.tokens) / self.rate if self.rate > 0 else 1.0
+
+    def take(self, now):
+        self._refill(now)
+        self.tokens -= 1
+
+    def pause(self, seconds):
+        self.paused_until = max(self.paused_until, time.monotonic() + seconds)
+
+    # Follow what the provider reports: its limit sets the rate, and nothing is sent beyond what it says is left
+    def update(self, limit=None, remaining=None, reset=None):
+        now = time.monotonic()
+        self._refill(now)
+        if limit:
+            self.rate = limit / RATE_LIMIT_WINDOW_SECONDS
+            self.capacity = max(1.0, limit)
+        if remaining is not None:
+            self.tokens = min(self.tokens, remaining)
+            if remaining < 1 and reset:
+                self.pause(reset)
+
+# Additive increase, multiplicative decrease of the number of concurrent requests
+class AdaptiveConcurrency:
+    def __init__(self, initial, maximum):
+        self.maximum = maximum
+        self.limit = min(initial, maximum)
+        self._last_decrease = 0.0
+
+    def on_success(self):
+        self.limit = min(self.maximum, self.limit + 1 / self.limit)
+
+    def on_overload(self):
+        now = time.monotonic()
+        # Requests already in flight fail together, one overload episode halves the limit only once
+        if now - self._last_decrease >= DECREASE_COOLDOWN_SECONDS:
+            self.limit = max(1.0, self.limit / 2)
+            self._last_decrease = now
+
+# Process-wide gate in front of the model: rate limit, adaptive concurrency, priority order, retries and deadlines
+class LLMScheduler:
+    def __init__(self, rate=REQUESTS_PER_SECOND, burst=BURST, initial_concurrency=INITIAL_CONCURRENCY, max_concurrency=MAX_CONCURRENCY):
+        self.bucket = TokenBucket(rate, burst)
+        self.concurrency = AdaptiveConcurrency(initial_concurrency, max_concurrency)
+        self._condition = threading.Condition()
+        self._waiting = []
+        self._sequence = itertools.count()
+        self.in_flight = 0
+
+    # Wait for a request slot and return the seconds spent waiting
+    def acquire(self, priority, deadline=None):
+        entry = (priority, next(self._sequence))
+        started = time.monotonic()
+        with self._condition:
+            heapq.heappush(self._waiting, entry)
+            try:
+                while True:
+                    now = time.monotonic()
+                    if deadline is not None and now >= deadline:
+                        raise DeadlineExceeded("Deadline passed while waiting for a model request slot")
+
+                    wait = None
+                    # Only the highest-priority, longest-waiting request may take the next slot
+                    if self._waiting[0] == entry and self.in_flight < max(1, int(self.concurrency.limit)):
+                        wait = self.bucket.delay(now)
+                        if wait <= 0:
+                            self.bucket.take(now)
+                            heapq.heappop(self._waiting)
+                            self.in_flight += 1
+                            self._condition.notify_all()
+                            return now - started
+
+                    if deadline is not None:
+                        wait = deadline - now if wait is None else min(wait, deadline - now)
+                    self._condition.wait(wait)
+            except BaseException:
+                if entry in self._waiting:
+                    self._waiting.remove(entry)
+                    heapq.heapify(self._waiting)
+                    self._condition.notify_all()
+                raise
+
+    def release(self):
+        with self._condition:
+            self.in_flight -= 1
+            self._condition.notify_all()
+
+    def _observe(self, source):
+        headers = response_headers(source)
+        if not headers:
+            return None
+        limit = _number(_header(headers, "x-ratelimit-limit-requests", "x-ratelimit-limit"))
+        remaining = _number(_header(headers, "x-ratelimit-remaining-requests", "x-ratelimit-remaining"))
+        reset = parse_seconds(_header(headers, "x-ratelimit-reset-requests", "x-ratelimit-reset"))
+        retry_after = parse_seconds(headers.get("retry-after"))
+        with self._condition:
+            self.bucket.update(limit, remaining, reset)
+            if retry_after:
+                self.bucket.pause(retry_after)
+            self._condition.notify_all()
+        return retry_after
+
+    def _on_success(self, source):
+        with self._condition:
+            self.concurrency.on_success()
+        self._observe(source)
+
+    # Record a failed attempt and return how long to back off, or None when it must not be retried
+    def _on_failure(self, error, attempt, max_retries, deadline, stage):
+        retry_after = self._observe(error)
+        if _is_overload(error):
+            with self._condition:
+                self.concurrency.on_overload()
+            metrics.increment(stage, "rate_limited_total" if _status_code(error) == 429 else "overloaded_total")
+
+        if not is_retryable(error) or attempt >= max_retries:
+            return None
+        # Full jitter keeps retries of many callers from arriving together
+        backoff = random.uniform(0, min(RETRY_MAX_SECONDS, RETRY_BASE_SECONDS * 2 ** attempt))
+        if retry_after:
+            backoff = max(backoff, retry_after)
+        if deadline is not None and time.monotonic() + backoff >= deadline:
+            return None
+        metrics.increment(stage, "retries_total")
+        logger.info("Retrying %s after %s (attempt %d) in %.2fs", stage, type(error).__name__, attempt + 1, backoff)
+        return backoff
+
+    def call(self, fn, priority=GENERATION, max_retries=2, stage="default"):
+        deadline = _deadline.get()
+        attempt = 0
+        while True:
+            record_scheduler_wait(self.acquire(priority, deadline))
+            try:
+                result = fn()
+            except Exception as error:
+                self.release()
+                backoff = self._on_failure(error, attempt, max_retries, deadline, stage)
+                if backoff is None:
+                    raise
+                time.sleep(backoff)
+                attempt += 1
+                continue
+            self.release()
+            self._on_success(result)
+            return result
+
+    # Streams are retried only until their first chunk, after that a failure reaches the caller
+    def stream(self, make_stream, priority=GENERATION, max_retries=2, stage="default"):
+        deadline = _deadline.get()
+        attempt = 0
+        while True:
+            record_scheduler_wait(self.acquire(priority, deadline))
+            released = False
+            started = False
+            try:
+                for chunk in make_stream():
+                    if not started:
+                        started = True
+                        self._observe(chunk)
+                    yield chunk
+            except Exception as error:
+                self.release()
+                released = True
+                backoff = None if started else self._on_failure(error, attempt, max_retries, deadline, stage)
+                if backoff is None:
+                    raise
+                time.sleep(backoff)
+                attempt += 1
+                continue
+            finally:
+                if not released:
+                    self.release()
+            with self._condition:
+                self.concurrency.on_success()
+            return
+
+scheduler = LLMScheduler()
+
+# Chat model wrapper that sends every invoke/stream call through the scheduler
+class ScheduledLLM:
+    def __init__(self, llm, service, max_retries, scheduler=scheduler):
+        self.llm = llm
+        self.service = service
+        self.max_retries = max_retries
+        self.scheduler = scheduler
+
+    def _priority(self):
+        priority = _priority.get()
+        return priority if priority is not None else SERVICE_PRIORITIES.get(self.service, GENERATION)
+
+    def bind(self, **kwargs):
+        return ScheduledLLM(self.llm.bind(**kwargs), self.service, self.max_retries, self.scheduler)
+
+    def invoke(self, *args, **kwargs):
+        return self.scheduler.call(lambda: self.llm.invoke(*args, **kwargs), self._priority(), self.max_retries, self.service or "default")
+
+    def stream(self, *args, **kwargs):
+        return self.scheduler.stream(lambda: self.llm.stream(*args, **kwargs), self._priority(), self.max_retries, self.service or "default")
+
+    def __getattr__(self, name):
+        return getattr(self.llm, name)
@@ -0,0 +1,173 @@
+import copy
+import functools
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+import unicodedata
+from collections import OrderedDict
+from models.llm import get_service_config
+from utils.instrumentation import metrics, record_cache_lookup, run_as_cache_miss
+from utils.single_flight import SingleFlightTimeout, single_flight
+
+# Cache configuration, an empty RESULT_CACHE_PATH keeps the cache in memory only
+CACHE_PATH = os.getenv("RESULT_CACHE_PATH", ".cache/results.sqlite3")
+MEMORY_ENTRIES = int(os.getenv("RESULT_CACHE_MEMORY_ENTRIES", "256"))
+MAX_DISK_ENTRIES = int(os.getenv("RESULT_CACHE_MAX_ENTRIES", "20000"))
+TTL_SECONDS = int(os.getenv("RESULT_CACHE_TTL_SECONDS", str(30 * 24 * 60 * 60)))
+EVICTION_INTERVAL = 100
+
+def normalize_text(text):
+    # Pasted text differs mostly in whitespace and line endings, which never changes the extraction
+    text = unicodedata.normalize("NFC", text)
+    return " ".join(text.split())
+
+def _normalize_input(value):
+    if isinstance(value, str):
+        return normalize_text(value)
+    if isinstance(value, dict):
+        return {key: _normalize_input(item) for key, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [_normalize_input(item) for item in value]
+    return value
+
+# Build a content-addressed key from the inputs, the prompt version and the model that answers the prompt
+def make_cache_key(namespace, prompt_version, model, inputs=(), keyword_inputs=None):
+    payload = json.dumps(
+        {"args": _normalize_input(list(inputs)), "kwargs": _normalize_input(keyword_inputs or {})},
+        sort_keys=True,
+        ensure_ascii=False,
+    )
+    digest = hashlib.sha256(payload.encode("utf-8")).hexdigest()
+    return f"{namespace}:{prompt_version}:{model}:{digest}"
+
+class ResultCache:
+    def __init__(self, path=CACHE_PATH, memory_entries=MEMORY_ENTRIES, max_entries=MAX_DISK_ENTRIES, ttl_seconds=TTL_SECONDS):
+        self.path = path
+        self.memory_entries = memory_entries
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._memory = OrderedDict()
+        self._lock = threading.Lock()
+        self._connection = None
+        self._writes = 0
+        self.stats = {"hits": 0, "misses": 0, "memory_hits": 0, "disk_hits": 0}
+
+    def _connect(self):
+        if self._connection is None and self.path:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            self._connection = sqlite3.connect(self.path, check_same_thread=False)
+            self._connection.execute(
+                "CREATE TABLE IF NOT EXISTS results ("
+                "key TEXT PRIMARY KEY, value TEXT NOT NULL, created_at REAL NOT NULL, accessed_at REAL NOT NULL)"
+            )
+            self._connection.execute("CREATE INDEX IF NOT EXISTS results_accessed_at ON results (accessed_at)")
+            self._connection.commit()
+        return self._connection
+
+    def _remember(self, key, serialized, created_at):
+        self._memory[key] = (serialized, created_at)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.memory_entries:
+            self._memory.popitem(last=False)
+
+    def get(self, key):
+        now = time.time()
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None and now - entry[1] <= self.ttl_seconds:
+                self._memory.move_to_end(key)
+                self.stats["hits"] += 1
+                self.stats["memory_hits"] += 1
+                return True, json.loads(entry[0])
+
+            connection = self._connect()
+            if connection is not None:
+                row = connection.execute(
+                    "SELECT value, created_at FROM results WHERE key = ? AND created_at >= ?",
+                    (key, now - self.ttl_seconds),
+                ).fetchone()
+                if row is not None:
+                    connection.execute("UPDATE results SET accessed_at = ? WHERE key = ?", (now, key))
+                    connection.commit()
+                    self._remember(key, row[0], row[1])
+                    self.stats["hits"] += 1
+                    self.stats["disk_hits"] += 1
+                    return True, json.loads(row[0])
+
+            self.stats["misses"] += 1
+            return False, None
+
+    def set(self, key, value):
+        serialized = json.dumps(value, ensure_ascii=False)
+        now = time.time()
+        with self._lock:
+            self._remember(key, serialized, now)
+            connection = self._connect()
+            if connection is None:
+                return
+            connection.execute(
+                "INSERT OR REPLACE INTO results (key, value, created_at, accessed_at) VALUES (?, ?, ?, ?)",
+                (key, serialized, now, now),
+            )
+            self._writes += 1
+            if self._writes % EVICTION_INTERVAL == 0:
+                self._evict(now)
+            connection.commit()
+
+    def _evict(self, now):
+        # Drop expired rows first, then the least recently used rows above the size limit
+        self._connection.execute("DELETE FROM results WHERE created_at < ?", (now - self.ttl_seconds,))
+        self._connection.execute(
+            "DELETE FROM results WHERE key IN ("
+            "SELECT key FROM results ORDER BY accessed_at DESC LIMIT -1 OFFSET ?)",
+            (self.max_entries,),
+        )
+
+    def clear(self):
+        with self._lock:
+            self._memory.clear()
+            connection = self._connect()
+            if connection is not None:
+                connection.execute("DELETE FROM results")
+                connection.commit()
+
+result_cache = ResultCache()
+
+# Cache the result of a service function, error results are never cached so they are retried on the next call.
+# `service` names the models.llm service whose model answers the call, it defaults to the namespace.
+def cached_result(namespace, prompt_version, service=None, cache=result_cache):
+    def decorator(fn):
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            config = get_service_config(service or namespace)
+            # Answers may come from the fast model, so it is part of the key too
+            model = "+".join(filter(None, (config["model"], config["fast_model"])))
+            key = make_cache_key(namespace, prompt_version, model, args, kwargs)
+            hit, value = cache.get(key)
+            record_cache_lookup(namespace, hit)
+            if hit:
+                return value
+
+            def load():
+                value = run_as_cache_miss(fn, *args, **kwargs)
+                if not (isinstance(value, dict) and "error" in value):
+                    cache.set(key, value)
+                return value
+
+            # Concurrent misses for the same key, e.g. many sessions pasting the same posting, share one call
+            try:
+                value, shared = single_flight.do(key, load)
+            except SingleFlightTimeout as error:
+                return {"error": str(error)}
+            if shared:
+                metrics.increment(namespace, "coalesced_total")
+                # Every caller gets its own copy, as it would from the cache
+                value = copy.deepcopy(value)
+            return value
+        return wrapper
+    return decorator
@@ -0,0 +1,174 @@
+import json
+import os
+import re
+from functools import partial
+from utils.task_graph import run_task_graph
+
+# Shorter documents are extracted with a single call, splitting them costs more prompt overhead than it saves
+MIN_SECTIONED_CHARS = int(os.getenv("SECTION_EXTRACTION_MIN_CHARS", "1500"))
+# Documents with fewer recognised headings are not structured enough to split
+MIN_SECTIONS = 2
+
+# Text before the first recognised heading, usually name, title and contact details
+HEADER_SECTION = "header"
+# Section name given to the chunks of a document that has no usable headings
+CHUNK_SECTION = "excerpt"
+
+# Text longer than the budget (in estimated tokens) is cut into overlapping chunks that are extracted in parallel
+TOKEN_BUDGET = int(os.getenv("EXTRACTION_TOKEN_BUDGET", "6000"))
+CHUNK_TOKENS = int(os.getenv("EXTRACTION_CHUNK_TOKENS", "2000"))
+CHUNK_OVERLAP_TOKENS = int(os.getenv("EXTRACTION_CHUNK_OVERLAP_TOKENS", "200"))
+CHARS_PER_TOKEN = 4
+
+def estimate_tokens(text):
+    return len(text) // CHARS_PER_TOKEN + 1
+
+# Cut `text` into chunks of about `chunk_tokens`, preferring paragraph, line and sentence breaks, where every chunk
+# repeats the last `overlap_tokens` of the one before so nothing that straddles a cut is lost
+def split_into_chunks(text, budget=None, chunk_tokens=None, overlap_tokens=None):
+    budget = budget or TOKEN_BUDGET
+    if estimate_tokens(text) <= budget:
+        return [text]
+
+    chunk_chars = (chunk_tokens or CHUNK_TOKENS) * CHARS_PER_TOKEN
+    overlap_chars = min((overlap_tokens if overlap_tokens is not None else CHUNK_OVERLAP_TOKENS) * CHARS_PER_TOKEN, chunk_chars // 2)
+    chunks = []
+    start = 0
+    while True:
+        end = min(len(text), start + chunk_chars)
+        if end < len(text):
+            search_from = start + chunk_chars * 4 // 5
+            for separator in ("\n\n", "\n", ". "):
+                cut = text.rfind(separator, search_from, end)
+                if cut != -1:
+                    end = cut + len(separator)
+                    break
+        chunks.append(text[start:end])
+        if end >= len(text):
+            return chunks
+
+        start = max(start + 1, end - overlap_chars)
+        # Start the next chunk at a word boundary
+        space = text.find(" ", start, end)
+        if space != -1:
+            start = space + 1
+
+def _heading_pattern(sections):
+    alternatives = {
+        re.escape(heading).replace(r"\ ", r"\s+"): section
+        for section, (headings, _) in sections.items()
+        for heading in headings
+    }
+    # Longest first, so "work experience" wins over "experience"
+    ordered = sorted(alternatives, key=len, reverse=True)
+    # A heading may be a markdown "#" heading or set in **bold**; list items ("- Contact", "* Training") are not headings
+    pattern = re.compile(
+        r"^[ \t]*(?:#{1,6}[ \t]*)?(?:\*\*|__)?(" + "|".join(ordered) + r")(?:\*\*|__)?[ \t]*(?::[ \t]*(?:\*\*|__)?[ \t]*(.*))?$",
+        re.IGNORECASE | re.MULTILINE,
+    )
+    lookup = {" ".join(heading.lower().split()): section for section, (headings, _) in sections.items() for heading in headings}
+    return pattern, lookup
+
+# Split a document on the headings of `sections` ({section: (headings, fields)}) into {section: text}.
+# Text under a repeated heading is appended to the same section, unknown headings stay part of the section above them.
+def split_sections(text, sections):
+    pattern, lookup = _heading_pattern(sections)
+    parts = {}
+    current, start = HEADER_SECTION, 0
+
+    for match in pattern.finditer(text):
+        parts.setdefault(current, []).append(text[start:match.start()])
+        current = lookup[" ".join(match.group(1).lower().split())]
+        start = match.start(2) if match.group(2) else match.end()
+    parts.setdefault(current, []).append(text[start:])
+
+    return {section: "\n".join(chunk.strip() for chunk in chunks if chunk.strip()) for section, chunks in parts.items() if any(chunk.strip() for chunk in chunks)}
+
+# Fields asked of each present section; fields whose usual section is missing are asked of the header (or the first section)
+def assign_fields(present_sections, sections, fields):
+    assignments = {}
+    for section, (_, section_fields) in sections.items():
+        if section in present_sections:
+            assignments[section] = [field for field in section_fields if field in fields]
+
+    covered = {field for section_fields in assignments.values() for field in section_fields}
+    uncovered = [field for field in fields if field not in covered]
+    if uncovered:
+        fallback = HEADER_SECTION if HEADER_SECTION in present_sections else next(iter(present_sections))
+        assignments.setdefault(fallback, [])
+        assignments[fallback] += uncovered
+
+    return {section: section_fields for section, section_fields in assignments.items() if section_fields}
+
+def _is_empty(value):
+    return value is None or value == "" or value == [] or value == {}
+
+def _dedupe_key(item):
+    if isinstance(item, str):
+        return " ".join(item.lower().split())
+    return json.dumps(item, sort_keys=True, ensure_ascii=False).lower()
+
+# Lists are unioned in section order, objects are merged key by key and other values come from the first section that has one
+def merge_section_results(results, fields):
+    merged = {}
+    for field in fields:
+        values = [result[field] for result in results if not _is_empty(result.get(field))]
+        if not values:
+            merged[field] = None
+        elif all(isinstance(value, list) for value in values):
+            seen = {}
+            for value in values:
+                for item in value:
+                    seen.setdefault(_dedupe_key(item), item)
+            merged[field] = list(seen.values())
+        elif all(isinstance(value, dict) for value in values):
+            combined = {}
+            for value in values:
+                for key, item in value.items():
+                    if _is_empty(combined.get(key)):
+                        combined[key] = item
+            merged[field] = combined
+        else:
+            merged[field] = values[0]
+    return merged
+
+# Run `extract_section(section, text, fields)` for every (section, text, fields) call in parallel and merge the
+# results in the order of `calls`, not in completion order
+def _extract_and_merge(calls, fields, extract_section):
+    names = [f"{section}:{index}" for index, (section, _, _) in enumerate(calls)]
+    results = run_task_graph({
+        name: (partial(extract_section, section, text, tuple(call_fields)), [])
+        for name, (section, text, call_fields) in zip(names, calls)
+    })
+
+    for name in names:
+        if "error" in results[name]:
+            return results[name]
+    return merge_section_results([results[name] for name in names], fields)
+
+# Extract `fields` section by section, each section with `extract_section(section, section_text, fields)`, in parallel.
+# Sections over the token budget are extracted chunk by chunk.
+# Returns None when the document is too short or unstructured to split, the caller then extracts it as a whole.
+def extract_by_section(text, fields, sections, extract_section):
+    if len(text) < MIN_SECTIONED_CHARS:
+        return None
+    parts = split_sections(text, sections)
+    if len([section for section in parts if section != HEADER_SECTION]) < MIN_SECTIONS:
+        return None
+
+    assignments = assign_fields(parts, sections, fields)
+    # In the priority order of `sections`, so that order decides between conflicting values
+    calls = [
+        (section, chunk, assignments[section])
+        for section in sections if section in assignments
+        for chunk in split_into_chunks(parts[section])
+    ]
+    return _extract_and_merge(calls, fields, extract_section)
+
+# Map-reduce extraction of a document without usable headings: every chunk is asked for all `fields` and the
+# partial results are merged, earlier chunks win for single values. Returns None when the text fits the budget.
+def extract_by_chunks(text, fields, extract_section):
+    chunks = split_into_chunks(text)
+    if len(chunks) == 1:
+        return None
+    return _extract_and_merge([(CHUNK_SECTION, chunk, list(fields)) for chunk in chunks], fields, extract_section)
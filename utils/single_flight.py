@@ -0,0 +1,55 @@
+import os
+import threading
+
+# How long a caller waits for an identical call already in flight before giving up
+WAIT_TIMEOUT_SECONDS = float(os.getenv("SINGLE_FLIGHT_TIMEOUT_SECONDS", "180"))
+
+class SingleFlightTimeout(TimeoutError):
+    pass
+
+class _Call:
+    def __init__(self):
+        self.done = threading.Event()
+        self.value = None
+        self.error = None
+
+# Process-wide de-duplication of concurrent calls: while a call for a key is running, further calls with the
+# same key wait for it and share its result, or its exception, instead of running the function again
+class SingleFlight:
+    def __init__(self, timeout=WAIT_TIMEOUT_SECONDS):
+        self.timeout = timeout
+        self._lock = threading.Lock()
+        self._calls = {}
+
+    # Returns `(value, shared)`, `shared` is True when the value came from a call started by someone else
+    def do(self, key, fn, *args, **kwargs):
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+
+        if not leader:
+            if not call.done.wait(self.timeout):
+                raise SingleFlightTimeout(f"Timed out after {self.timeout:g}s waiting for an identical call in flight")
+            if call.error is not None:
+                raise call.error
+            return call.value, True
+
+        try:
+            call.value = fn(*args, **kwargs)
+        except BaseException as error:
+            call.error = error
+            raise
+        finally:
+            # Later callers start a new call, so a failure is never cached beyond the callers that were already waiting
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+        return call.value, False
+
+    def in_flight(self):
+        with self._lock:
+            return len(self._calls)
+
+single_flight = SingleFlight()
@@ -0,0 +1,213 @@
+import re
+from difflib import SequenceMatcher
+
+# Canonical skill name -> common spellings, abbreviations and synonyms.
+# Only true equivalents belong here, a related or narrower skill (pytest for JUnit, Unix for Linux) would count as a match.
+SKILL_ALIASES = {
+    "javascript": ["js", "ecmascript", "es6", "es2015", "vanilla js"],
+    "typescript": ["ts"],
+    "python": ["python3", "python 3", "py"],
+    "golang": ["go", "go lang"],
+    "c++": ["cpp", "cplusplus"],
+    "c#": ["csharp", "c sharp"],
+    ".net": ["dotnet", "dot net"],
+    "node.js": ["node", "nodejs", "node js"],
+    "react": ["react.js", "reactjs", "react js"],
+    "react native": ["react-native"],
+    "angular": ["angular.js", "angularjs", "angular js"],
+    "vue": ["vue.js", "vuejs", "vue js"],
+    "next.js": ["nextjs"],
+    "express": ["express.js", "expressjs"],
+    "django rest framework": ["drf"],
+    "spring boot": ["springboot"],
+    "html": ["html5"],
+    "css": ["css3"],
+    "sql": ["structured query language"],
+    "postgresql": ["postgres", "psql", "postgre sql"],
+    "mysql": ["my sql"],
+    "mongodb": ["mongo", "mongo db"],
+    "microsoft sql server": ["mssql", "sql server", "ms sql"],
+    "nosql": ["no sql", "non-relational databases"],
+    "elasticsearch": ["elastic search"],
+    "redis": ["redis cache"],
+    "amazon web services": ["aws"],
+    "google cloud platform": ["gcp", "google cloud"],
+    "microsoft azure": ["azure"],
+    "kubernetes": ["k8s", "kube"],
+    "docker": ["docker containers"],
+    "continuous integration and delivery": ["ci/cd", "ci cd", "cicd"],
+    "terraform": ["hashicorp terraform"],
+    "infrastructure as code": ["iac"],
+    "rest apis": ["rest", "restful", "restful apis", "rest api", "restful services", "restful web services"],
+    "graphql": ["graph ql"],
+    "microservices": ["micro services", "microservice architecture", "microservices architecture"],
+    "machine learning": ["ml"],
+    "deep learning": ["dl"],
+    "artificial intelligence": ["ai"],
+    "natural language processing": ["nlp"],
+    "large language models": ["llm", "llms"],
+    "generative ai": ["genai", "gen ai"],
+    "tensorflow": ["tf"],
+    "pytorch": ["torch"],
+    "scikit-learn": ["sklearn", "scikit learn"],
+    "pandas": ["python pandas"],
+    "numpy": ["num py"],
+    "data structures and algorithms": ["dsa"],
+    "object-oriented programming": ["oop", "oops", "object oriented programming", "object oriented design", "ood"],
+    "test-driven development": ["tdd", "test driven development"],
+    "unit testing": ["unit tests"],
+    "agile": ["agile methodologies", "agile methodology"],
+    "user interface design": ["ui", "ui design"],
+    "user experience design": ["ux", "ux design"],
+    "search engine optimization": ["seo"],
+    "customer relationship management": ["crm"],
+    "key performance indicators": ["kpi", "kpis"],
+    "business intelligence": ["bi"],
+    "power bi": ["powerbi", "microsoft power bi"],
+    "microsoft excel": ["excel", "ms excel"],
+    "linux": ["gnu/linux"],
+    "shell scripting": ["bash", "shell", "bash scripting"],
+    "amazon ec2": ["ec2"],
+    "amazon s3": ["s3"],
+    "aws lambda": ["lambda functions"],
+    "apache kafka": ["kafka"],
+    "apache spark": ["spark"],
+    "hadoop": ["apache hadoop"],
+    "extract transform load": ["etl"],
+    "communication": ["communication skills", "verbal communication", "written communication"],
+    "problem solving": ["problem-solving", "problem solving skills"],
+    "teamwork": ["team player", "collaboration", "team work"],
+    "leadership": ["team leadership", "leading teams"],
+    "software development life cycle": ["sdlc"],
+    "system design": ["systems design"],
+}
+
+# Words that qualify a skill without changing what it is ("Python programming" == "Python")
+FILLER_WORDS = {
+    "experience", "with", "in", "of", "knowledge", "skills", "skill", "proficiency", "proficient",
+    "familiarity", "familiar", "strong", "good", "excellent", "solid", "hands-on", "hands", "on",
+    "working", "programming", "language", "languages", "framework", "frameworks", "development",
+    "tools", "tool", "concepts", "understanding", "the", "and", "using", "expertise", "basic", "advanced",
+}
+
+SKILL_WEIGHT = 0.7
+KEYWORD_WEIGHT = 0.3
+FUZZY_THRESHOLD = 0.88
+MATCH_THRESHOLD = 0.6
+PARTIAL_MATCH_SCORE = 0.8
+MENTION_MATCH_SCORE = 0.7
+# Shorter single-word terms ("go", "r", "c") occur inside ordinary prose too often to count as mentions
+MIN_MENTION_TERM_LENGTH = 4
+
+_NON_TERM_CHARACTERS = re.compile(r"[^a-z0-9+#./\- ]+")
+
+def normalize_term(term):
+    term = str(term).lower().replace("&", " and ")
+    term = _NON_TERM_CHARACTERS.sub(" ", term)
+    return " ".join(term.strip(" .-/").split())
+
+def _build_alias_index(aliases):
+    index = {}
+    for canonical, variants in aliases.items():
+        canonical_term = normalize_term(canonical)
+        index[canonical_term] = canonical_term
+        for variant in variants:
+            index.setdefault(normalize_term(variant), canonical_term)
+    return index
+
+ALIAS_INDEX = _build_alias_index(SKILL_ALIASES)
+
+def canonicalize(term):
+    normalized = normalize_term(term)
+    if normalized in ALIAS_INDEX:
+        return ALIAS_INDEX[normalized]
+
+    # Retry without filler words, so "Proficiency in JS" still resolves to "javascript"
+    core = " ".join(word for word in normalized.split() if word not in FILLER_WORDS) or normalized
+    return ALIAS_INDEX.get(core, core)
+
+def _as_terms(value):
+    if not value:
+        return []
+    if isinstance(value, str):
+        return [part for part in re.split(r"[,;\n]", value) if part.strip()]
+    if isinstance(value, dict):
+        return [str(item) for item in value.values() if item]
+    return [str(item) for item in value if item]
+
+def _flatten_text(value):
+    if isinstance(value, dict):
+        return " ".join(_flatten_text(item) for item in value.values())
+    if isinstance(value, (list, tuple)):
+        return " ".join(_flatten_text(item) for item in value)
+    return normalize_term(value) if value else ""
+
+class ResumeTermIndex:
+    def __init__(self, resume_json):
+        terms = _as_terms(resume_json.get("skills")) + _as_terms(resume_json.get("keywords")) + _as_terms(resume_json.get("certifications"))
+        self.canonical_terms = {canonicalize(term) for term in terms}
+        self.canonical_terms.discard("")
+        self.tokens = {token for term in self.canonical_terms for token in term.split()}
+        self.text = f" {_flatten_text(resume_json)} "
+
+    # Score how well the resume covers a single job term, from 0.0 (missing) to 1.0 (exact or alias match)
+    def score(self, term):
+        canonical = canonicalize(term)
+        if not canonical:
+            return 1.0
+        if canonical in self.canonical_terms:
+            return 1.0
+
+        # Multi-word terms whose every significant token appears among resume terms ("cloud aws" vs "aws", "cloud")
+        term_tokens = canonical.split()
+        if len(term_tokens) > 1 and all(token in self.tokens for token in term_tokens):
+            return PARTIAL_MATCH_SCORE
+
+        best = 0.0
+        for candidate in self.canonical_terms:
+            matcher = SequenceMatcher(None, canonical, candidate)
+            if matcher.real_quick_ratio() < FUZZY_THRESHOLD or matcher.quick_ratio() < FUZZY_THRESHOLD:
+                continue
+            best = max(best, matcher.ratio())
+        if best >= FUZZY_THRESHOLD:
+            return best
+
+        # Mentioned somewhere else in the resume (experience, projects, ...) counts as weaker evidence
+        for mention in {canonical, normalize_term(term)}:
+            if (" " in mention or len(mention) >= MIN_MENTION_TERM_LENGTH) and f" {mention} " in self.text:
+                return MENTION_MATCH_SCORE
+        return 0.0
+
+def _coverage(index, terms, resolved_terms):
+    unique_terms = {}
+    for term in terms:
+        unique_terms.setdefault(canonicalize(term), term.strip())
+    unique_terms.pop("", None)
+
+    scores = {}
+    for canonical, original in unique_terms.items():
+        scores[original] = 1.0 if canonical in resolved_terms else index.score(original)
+
+    missing = [term for term, score in scores.items() if score < MATCH_THRESHOLD]
+    coverage = sum(scores.values()) / len(scores) if scores else None
+    return coverage, missing
+
+# Compare extracted resume and job details locally, returning the same dict shape as the LLM comparison.
+# `resolved_terms` holds canonical job terms that were confirmed as covered elsewhere (e.g. by the LLM fallback).
+def match_resume_to_job(resume_json, job_json, resolved_terms=()):
+    index = ResumeTermIndex(resume_json or {})
+    job_json = job_json or {}
+    resolved_terms = {canonicalize(term) for term in resolved_terms}
+
+    skill_coverage, missing_skills = _coverage(index, _as_terms(job_json.get("skills")), resolved_terms)
+    keyword_coverage, missing_keywords = _coverage(index, _as_terms(job_json.get("keywords")), resolved_terms)
+
+    weighted = [(coverage, weight) for coverage, weight in ((skill_coverage, SKILL_WEIGHT), (keyword_coverage, KEYWORD_WEIGHT)) if coverage is not None]
+    total_weight = sum(weight for _, weight in weighted)
+    matching_score = round(100 * sum(coverage * weight for coverage, weight in weighted) / total_weight) if total_weight else 0
+
+    return {
+        "matching_score": matching_score,
+        "missing_skills": missing_skills,
+        "missing_keywords": missing_keywords,
+    }
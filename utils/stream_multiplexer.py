@@ -0,0 +1,48 @@
+import queue
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from utils.instrumentation import submit_with_context
+
+_FINISHED = object()
+
+# Consume several chunk iterators concurrently and yield `(name, chunk)` pairs in arrival order.
+# A stream that raises yields `(name, error)` with the exception instance and is then considered finished.
+# When the consumer stops early (e.g. a Streamlit rerun) the streams are abandoned at their next chunk instead of
+# being read to the end.
+def multiplex_streams(streams):
+    events = queue.Queue()
+    stopped = threading.Event()
+
+    def drain(name, stream):
+        try:
+            for chunk in stream:
+                if stopped.is_set():
+                    break
+                events.put((name, chunk))
+        except Exception as error:
+            events.put((name, error))
+        finally:
+            # A generator can only be closed by the thread iterating it, this also releases its scheduler slot
+            close = getattr(stream, "close", None)
+            if close is not None:
+                close()
+            events.put((name, _FINISHED))
+
+    if not streams:
+        return
+
+    executor = ThreadPoolExecutor(max_workers=len(streams))
+    try:
+        for name, stream in streams.items():
+            submit_with_context(executor, drain, name, stream)
+
+        remaining = len(streams)
+        while remaining:
+            name, chunk = events.get()
+            if chunk is _FINISHED:
+                remaining -= 1
+            else:
+                yield name, chunk
+    finally:
+        stopped.set()
+        executor.shutdown(wait=False, cancel_futures=True)
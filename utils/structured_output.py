@@ -0,0 +1,231 @@
+import json
+import os
+import re
+from models.llm import get_llm, get_service_config
+from utils.instrumentation import metrics, record_parse_result
+from utils.llm_scheduler import DeadlineExceeded, is_retryable
+
+# Ask the provider for JSON mode on structured calls, set LLM_JSON_MODE=false for models that do not support it
+JSON_MODE = os.getenv("LLM_JSON_MODE", "true").lower() in ("1", "true", "yes")
+
+MAX_TRUNCATION_CUTS = 50
+
+_FENCED_BLOCK = re.compile(r"```(?:json|JSON)?\s*(.*?)(?:```|$)", re.DOTALL)
+
+class StructuredOutputError(ValueError):
+    pass
+
+def _scan(text):
+    # Closing brackets still open at the end of `text`, whether it ends inside a string,
+    # and the positions of the commas that separate values outside of strings
+    closers, separators = [], []
+    in_string = escaped = False
+    for position, character in enumerate(text):
+        if in_string:
+            if escaped:
+                escaped = False
+            elif character == "\\":
+                escaped = True
+            elif character == '"':
+                in_string = False
+        elif character == '"':
+            in_string = True
+        elif character in "{[":
+            closers.append("}" if character == "{" else "]")
+        elif character in "}]":
+            if closers:
+                closers.pop()
+        elif character == ",":
+            separators.append(position)
+    return closers, in_string, separators
+
+def _close(prefix):
+    prefix = prefix.rstrip().rstrip(",").rstrip()
+    closers, in_string, _ = _scan(prefix)
+    if in_string:
+        return None
+    return prefix + "".join(reversed(closers))
+
+def _repair_truncated(text):
+    _, in_string, separators = _scan(text)
+
+    # Output cut right after a complete value only needs its brackets closed
+    if not in_string:
+        candidate = _close(text)
+        try:
+            return json.loads(candidate)
+        except (TypeError, json.JSONDecodeError):
+            pass
+
+    # Otherwise drop the value that was being written when the output stopped
+    for position in reversed(separators[-MAX_TRUNCATION_CUTS:]):
+        candidate = _close(text[:position])
+        if candidate is None:
+            continue
+        try:
+            return json.loads(candidate)
+        except json.JSONDecodeError:
+            continue
+    raise StructuredOutputError("Could not recover JSON from the response")
+
+# `text` from its first bracket on, where the JSON starts when the model wrote something before it
+def _from_first_bracket(text):
+    starts = [index for index in (text.find("{"), text.find("[")) if index != -1]
+    if not starts:
+        raise StructuredOutputError("No JSON found in the response")
+    return text[min(starts):]
+
+# Parse model output that should be JSON, tolerating code fences, text around the JSON and truncated output.
+# Returns `(value, complete)`, where `complete` is False when the output was cut off and had to be closed.
+def parse_json_response(text):
+    text = (text or "").strip()
+    decoder = json.JSONDecoder()
+    # The unmodified text first, its string values may contain ``` that must not be taken for a fence
+    try:
+        return json.loads(text), True
+    except json.JSONDecodeError:
+        pass
+    try:
+        # Ignores any explanation the model added after the JSON
+        return decoder.raw_decode(_from_first_bracket(text))[0], True
+    except (StructuredOutputError, json.JSONDecodeError):
+        pass
+
+    fenced = _FENCED_BLOCK.search(text)
+    if fenced:
+        text = fenced.group(1).strip()
+    text = _from_first_bracket(text)
+    try:
+        return decoder.raw_decode(text)[0], True
+    except json.JSONDecodeError:
+        return _repair_truncated(text), False
+
+# Render {"field": "description"} as the bulleted field list used in extraction prompts
+def format_field_list(fields):
+    return "\n".join(f'    - "{name}": {description}' for name, description in fields.items())
+
+def _response_text(response):
+    return response.content if hasattr(response, 'content') else str(response)
+
+# Services (and fast models, as "<service>:fast") whose model rejected JSON mode, so the failing request is only paid once per process
+_json_mode_unsupported = set()
+
+_JSON_MODE_REJECTION = re.compile(r"response_format|json_object|json mode", re.IGNORECASE)
+
+# Only a request error about response_format itself says the model lacks JSON mode, not auth, quota or other failures
+def _rejects_json_mode(error):
+    return not is_retryable(error) and bool(_JSON_MODE_REJECTION.search(str(error)))
+
+def _invoke(service, prompt, fast=False):
+    llm = get_llm(service, fast=fast)
+    mode_key = f"{service}:fast" if fast else service
+    if JSON_MODE and mode_key not in _json_mode_unsupported:
+        try:
+            return _response_text(llm.bind(response_format={"type": "json_object"}).invoke(input=prompt))
+        except Exception as error:
+            if not _rejects_json_mode(error):
+                raise
+            # The selected model does not support JSON mode, ask again with a plain request
+            _json_mode_unsupported.add(mode_key)
+    return _response_text(llm.invoke(input=prompt))
+
+# Rate limits, overloads and timeouts that outlasted the scheduler's retries, or the caller's deadline passing
+def _is_unavailable(error):
+    return is_retryable(error) or isinstance(error, DeadlineExceeded)
+
+def _repair_missing_keys(service, prompt, missing_keys):
+    repair_prompt = f"""{prompt}
+
+    Your previous answer was cut off. Return **ONLY** a JSON object with the following keys, nothing else:
+    {json.dumps(sorted(missing_keys))}
+    """
+    value, complete = parse_json_response(_invoke(service, repair_prompt))
+    record_parse_result(complete)
+    return value if isinstance(value, dict) else {}
+
+def _repair_malformed(service, response_content):
+    repair_prompt = f"""
+    The following text was supposed to be a single valid JSON object but it cannot be parsed.
+    Fix the syntax only, without changing, adding or removing any data, and return **ONLY** the corrected JSON.
+
+    {response_content}
+    """
+    value, _ = parse_json_response(_invoke(service, repair_prompt))
+    record_parse_result(True)
+    return value
+
+_LIST_DESCRIPTION = re.compile(r"^(?:an array|a list)\b", re.IGNORECASE)
+
+# A fast answer is accepted when it is a complete object with every expected key, list fields (described as
+# "An array ..." / "A list ...") hold lists and every one of `required_keys` has a value. Other empty values are
+# valid answers, a section may simply not mention a field.
+def _is_valid(value, complete, expected_keys, required_keys=()):
+    if not complete or not isinstance(value, dict) or not set(expected_keys) <= set(value):
+        return False
+    if isinstance(expected_keys, dict):
+        for key, description in expected_keys.items():
+            if _LIST_DESCRIPTION.match(str(description)) and value[key] is not None and not isinstance(value[key], list):
+                return False
+    return all(value.get(key) not in (None, "", [], {}) for key in required_keys)
+
+# Ask the service's fast model and return its answer only if it passes validation
+def _invoke_fast(service, prompt, expected_keys, required_keys=()):
+    try:
+        value, complete = parse_json_response(_invoke(service, prompt, fast=True))
+    except Exception:
+        # Unparsable, unavailable or rejected, the main model gets the prompt either way
+        value, complete = None, False
+    record_parse_result(complete)
+
+    if _is_valid(value, complete, expected_keys, required_keys):
+        return value
+    metrics.increment(service, "escalations_total")
+    return None
+
+# Run a prompt that must answer with a JSON object and return the parsed dict.
+# With a fast model configured for the service it is tried first, and the main model only gets the prompt when the
+# fast answer fails validation, or leaves one of `required_keys` empty.
+# Truncated answers are completed by asking only for the missing `expected_keys`, and unparsable answers are
+# sent back once for a syntax-only fix. When nothing works an {"error": ...} dict is returned as before.
+def invoke_json(service, prompt, expected_keys=(), repair=True, required_keys=()):
+    if get_service_config(service)["fast_model"]:
+        value = _invoke_fast(service, prompt, expected_keys, required_keys)
+        if value is not None:
+            return value
+
+    try:
+        response_content = _invoke(service, prompt)
+    except Exception as error:
+        if not _is_unavailable(error):
+            raise
+        return {"error": f"The model is unavailable, please try again later ({type(error).__name__}: {error})"}
+
+    try:
+        value, complete = parse_json_response(response_content)
+        record_parse_result(complete)
+    except StructuredOutputError:
+        record_parse_result(False)
+        if not repair:
+            return {"error": "Failed to parse the response into JSON", "response": response_content}
+        try:
+            value, complete = _repair_malformed(service, response_content), True
+        except Exception as error:
+            if not (isinstance(error, StructuredOutputError) or _is_unavailable(error)):
+                raise
+            return {"error": "Failed to parse the response into JSON", "response": response_content}
+
+    if not isinstance(value, dict):
+        return {"error": "The response is not a JSON object", "response": response_content}
+
+    missing_keys = set(expected_keys) - set(value)
+    if repair and not complete and missing_keys:
+        try:
+            repaired = _repair_missing_keys(service, prompt, missing_keys)
+        except Exception as error:
+            if not (isinstance(error, StructuredOutputError) or _is_unavailable(error)):
+                raise
+            # The recovered part of the truncated answer is still worth returning
+            repaired = {}
+        value.update({key: repaired[key] for key in missing_keys if key in repaired})
+
+    return value
@@ -0,0 +1,35 @@
+import os
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from utils.instrumentation import submit_with_context
+
+# Upper bound on concurrent LLM round-trips issued by a single pipeline run
+DEFAULT_MAX_WORKERS = int(os.getenv("PIPELINE_MAX_WORKERS", "6"))
+
+# Run a dependency graph of tasks on a bounded thread pool.
+# `tasks` maps a task name to `(fn, dependencies)`; each task is started as soon as all of its
+# dependencies are finished and receives their results as keyword arguments named after them.
+def run_task_graph(tasks, max_workers=None):
+    for name, (_, dependencies) in tasks.items():
+        for dependency in dependencies:
+            if dependency not in tasks:
+                raise ValueError(f"Task '{name}' depends on unknown task '{dependency}'")
+
+    results = {}
+    pending = dict(tasks)
+    running = {}
+
+    with ThreadPoolExecutor(max_workers=max_workers or DEFAULT_MAX_WORKERS) as executor:
+        while pending or running:
+            ready = [name for name, (_, dependencies) in pending.items() if all(d in results for d in dependencies)]
+            for name in ready:
+                fn, dependencies = pending.pop(name)
+                running[submit_with_context(executor, fn, **{d: results[d] for d in dependencies})] = name
+
+            if not running:
+                raise ValueError(f"Task graph contains a dependency cycle: {', '.join(pending)}")
+
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                results[running.pop(future)] = future.result()
+
+    return results
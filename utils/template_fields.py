@@ -0,0 +1,86 @@
+import json
+import re
+from functools import lru_cache
+
+PLACEHOLDER_PATTERN = re.compile(r"\[([^\[\]\n]{1,150})\]")
+
+# Fields every generated message needs, whatever the template asks for
+BASE_RESUME_FIELDS = ("applicant_name",)
+BASE_JOB_FIELDS = ("role", "company_name")
+
+# (placeholder keywords, keywords that veto the rule, resume fields, job fields), matched on the lowercased placeholder
+PLACEHOLDER_FIELD_RULES = [
+    (("recipient", "hiring manager"), (), (), ("recruiter_name",)),
+    (("job title",), (), (), ("role",)),
+    (("job id", "job link"), (), (), ("apply_link",)),
+    (("company name",), ("current",), (), ("company_name",)),
+    (("current company",), (), ("current_company",), ()),
+    (("current role", "current job title", "profession"), (), ("current_role",), ()),
+    (("your name", "full name"), (), ("applicant_name",), ()),
+    (("degree", "field of study"), (), ("latest_education",), ()),
+    (("college", "university"), (), ("latest_college_name",), ()),
+    (("year",), (), ("work_experience", "latest_education"), ("years_of_experience_required",)),
+    (("skill", "technolog", "tools", "traits", "quality", "key areas", "approach"), (), ("skills",), ("skills", "desired_qualities")),
+    (("responsibilit",), (), ("work_experience",), ("job_responsibilities",)),
+    (("achievement", "result", "impact", "outcome", "takeaway", "rank", "rating"), (), ("achievements", "projects"), ()),
+    (("project", "initiative", "product", "what you did"), (), ("projects",), ()),
+    (("certification", "course", "training"), (), ("certifications",), ()),
+    (("platform", "leetcode", "codeforces", "codechef"), (), ("achievements", "social_media_profiles"), ()),
+    (("profile", "linkedin", "github", "portfolio", "website", "url"), ("company",), ("social_media_profiles", "contact_information"), ()),
+    (("contact information",), (), ("contact_information",), ()),
+    (("field", "industry"), (), ("current_role", "work_experience"), ("company_description",)),
+    (("interest",), (), ("hobbies_interests",), ()),
+    (("aspect of the company", "value", "company or its work"), (), (), ("company_description", "keywords")),
+]
+
+def extract_placeholders(template):
+    return [placeholder.strip() for placeholder in PLACEHOLDER_PATTERN.findall(template or "")]
+
+def _fields_for_placeholder(placeholder):
+    placeholder = placeholder.lower()
+    resume_fields, job_fields = set(), set()
+    for keywords, vetoes, rule_resume_fields, rule_job_fields in PLACEHOLDER_FIELD_RULES:
+        if any(keyword in placeholder for keyword in keywords) and not any(veto in placeholder for veto in vetoes):
+            resume_fields.update(rule_resume_fields)
+            job_fields.update(rule_job_fields)
+    return resume_fields, job_fields
+
+# Resume and job fields a template needs, or (None, None) when the template cannot be analyzed
+# (no placeholders, or a placeholder we cannot map) and the full details have to be sent
+@lru_cache(maxsize=128)
+def required_fields(template):
+    placeholders = extract_placeholders(template)
+    if not placeholders:
+        return None, None
+
+    resume_fields, job_fields = set(BASE_RESUME_FIELDS), set(BASE_JOB_FIELDS)
+    for placeholder in placeholders:
+        placeholder_resume_fields, placeholder_job_fields = _fields_for_placeholder(placeholder)
+        if not placeholder_resume_fields and not placeholder_job_fields:
+            return None, None
+        resume_fields |= placeholder_resume_fields
+        job_fields |= placeholder_job_fields
+    return frozenset(resume_fields), frozenset(job_fields)
+
+def project_details(details, fields):
+    if not isinstance(details, dict):
+        return details
+    return {key: value for key, value in details.items() if (fields is None or key in fields) and value not in (None, "", [], {})}
+
+# Keep only the resume and job fields the template's placeholders refer to
+def project_details_for_template(template, resume_details, job_details):
+    return project_details_for_templates([template], resume_details, job_details)
+
+# Same as project_details_for_template, for a prompt that fills several templates at once
+def project_details_for_templates(templates, resume_details, job_details):
+    resume_fields, job_fields = set(), set()
+    for template in templates:
+        template_resume_fields, template_job_fields = required_fields(template)
+        if template_resume_fields is None:
+            return project_details(resume_details, None), project_details(job_details, None)
+        resume_fields |= template_resume_fields
+        job_fields |= template_job_fields
+    return project_details(resume_details, resume_fields), project_details(job_details, job_fields)
+
+def compact_json(value):
+    return json.dumps(value, ensure_ascii=False, separators=(",", ":"))